@@ -1,21 +1,91 @@
+from contextlib import nullcontext
 from dataclasses import asdict
 import json
+from typing import Callable
 
 from redis import Redis
+from redis.client import Pipeline
+from redis.exceptions import WatchError
 
+from cache_refresher.leader import LeadershipLost, RedisLeaderElection
 from cache_refresher.repositories import CacheRepository
+from journeys.app.repositories import journeys_cache_field, journeys_cache_key, snapshot_version_cache_key
+from journeys.app.snapshots import snapshot_version, write_snapshot
+from journeys.core.materializers import MaterializedJourneys
 from journeys.core.models import FlightEvent
 
 
 class RedisCacheRepository(CacheRepository):
+    """
+    Refresh the Redis cache read by the API.
 
-    def __init__(self, repository_uri: str, cache_key: str):
+    Flights, their snapshot version and the journeys materialized from them are written in a single transaction, so
+    the API never reads journeys of another snapshot than the version it sees. With leader election, writes are fenced
+    by the leader token: they're applied in a transaction watching the lock, and LeadershipLost is raised instead if
+    this replica doesn't hold it anymore. Lease renewals are held meanwhile, so only another replica taking the lock
+    aborts them.
+    """
+
+    def __init__(self, repository_uri: str, cache_key: str, leader_election: RedisLeaderElection | None = None):
         self._connection = Redis.from_url(repository_uri)
         self._connection.ping()
         self._cache_key = cache_key
+        self._leader_election = leader_election
+
+    def refresh_cache(self, results: list[FlightEvent], journeys: MaterializedJourneys | None = None) -> None:
+        flights = {
+            self._cache_key: json.dumps([asdict(flight_event) for flight_event in results], default=str),
+            snapshot_version_cache_key(self._cache_key): snapshot_version(results),
+        }
+        journeys_key = journeys_cache_key(self._cache_key)
+        mapping = {
+            journeys_cache_field(*key): json.dumps(
+                [[asdict(flight_event) for flight_event in journey.flight_events] for journey in journeys_found],
+                default=str,
+            )
+            for key, journeys_found in (journeys or {}).items()
+        }
+
+        def write(pipeline: Pipeline) -> None:
+            pipeline.mset(flights)
+            if journeys is not None:
+                pipeline.delete(journeys_key)
+                if mapping:
+                    pipeline.hset(journeys_key, mapping=mapping)
+
+        self._write(write)
+
+    def _write(self, write: Callable[[Pipeline], None]) -> None:
+        renewals_held = self._leader_election.renewals_held() if self._leader_election is not None else nullcontext()
+        with renewals_held, self._connection.pipeline() as pipeline:
+            if self._leader_election is not None:
+                pipeline.watch(self._leader_election.lock_key)
+                if pipeline.get(self._leader_election.lock_key) != self._leader_election.token:
+                    raise LeadershipLost()
+                pipeline.multi()
+            write(pipeline)
+            try:
+                pipeline.execute()
+            except WatchError:
+                raise LeadershipLost()
+
+
+class SnapshotFileCacheRepository(CacheRepository):
+    """Atomically replace a memory-mappable snapshot file shared by the API worker processes."""
+
+    def __init__(self, snapshot_path: str):
+        self._snapshot_path = snapshot_path
+
+    def refresh_cache(self, results: list[FlightEvent], journeys: MaterializedJourneys | None = None) -> None:
+        write_snapshot(self._snapshot_path, results)
+
+
+class CompositeCacheRepository(CacheRepository):
+    """Refresh several caches with the same results."""
+
+    def __init__(self, *cache_repositories: CacheRepository):
+        self._cache_repositories = cache_repositories
 
-    def refresh_cache(self, results: list[FlightEvent]) -> None:
-        self._connection.set(
-            self._cache_key,
-            json.dumps([asdict(flight_event) for flight_event in results], default=str),
-        )
+    def refresh_cache(self, results: list[FlightEvent], journeys: MaterializedJourneys | None = None) -> None:
+        for cache_repository in self._cache_repositories:
+            cache_repository.refresh_cache(results, journeys)
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 from cache_refresher.repositories import CacheRepository
+from journeys.core.materializers import JourneysMaterializer
+from journeys.core.models import RetentionWindow
 from journeys.core.repositories import FlightsRepository
 
 
@@ -8,8 +10,13 @@ class CacheRefresher:
 
     flights_repository: FlightsRepository
     cache_repository: CacheRepository
+    journeys_materializer: JourneysMaterializer | None = None
+    retention_window: RetentionWindow | None = None
 
     def run(self) -> None:
         results = self.flights_repository.get_flight_events()
-        self.cache_repository.refresh_cache(results)
-
+        if self.retention_window is not None:
+            results = self.retention_window.prune(results)
+        # Materialized before writing anything, so flights and journeys are replaced together.
+        journeys = self.journeys_materializer(results) if self.journeys_materializer is not None else None
+        self.cache_repository.refresh_cache(results, journeys)
@@ -0,0 +1,91 @@
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+from uuid import uuid4
+
+from redis import Redis, RedisError
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LeadershipLost(Exception):
+    """The lease expired or was taken by another replica, writes with the previous token must not happen."""
+
+
+class RedisLeaderElection:
+    """
+    Elect a single cache refresher replica through a Redis lock with a renewable lease.
+
+    Every replica tries to acquire the lock with its own random token. The holder renews the lease while alive,
+    the others stand by and acquire it once it expires. The token fences the leader writes: they're only applied
+    while the lock still holds it. While refreshing, the lease is renewed in background so refreshes taking longer
+    than the lease don't hand the lock over to a standby replica. Renewals are held while writes watch the lock, as
+    renewing it would abort them.
+    """
+
+    RENEW_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, repository_uri: str, lock_key: str, lease_ms: int):
+        self._connection = Redis.from_url(repository_uri)
+        self._connection.ping()
+        self.lock_key = lock_key
+        self.token = uuid4().hex.encode()
+        self._lease_ms = lease_ms
+        self._renew = self._connection.register_script(self.RENEW_SCRIPT)
+        self._release = self._connection.register_script(self.RELEASE_SCRIPT)
+        self._renewals = Lock()
+
+    def acquire_or_renew(self) -> bool:
+        """Return true if this replica holds the lease after the call."""
+        if self._connection.set(self.lock_key, self.token, nx=True, px=self._lease_ms):
+            return True
+        return self.renew()
+
+    def renew(self) -> bool:
+        """Extend the lease, return false if this replica doesn't hold it anymore."""
+        return bool(self._renew(keys=[self.lock_key], args=[self.token, self._lease_ms]))
+
+    @contextmanager
+    def renewing(self, every: float) -> Iterator[None]:
+        """Renew the lease every `every` seconds in a background thread while the block runs."""
+        stop = Event()
+
+        def keep_renewing() -> None:
+            while not stop.wait(every):
+                try:
+                    with self._renewals:
+                        renewed = self.renew()
+                    if not renewed:
+                        LOGGER.warning("Lease lost while refreshing.")
+                        return
+                except RedisError:
+                    LOGGER.exception("Could not renew lease, retrying.")
+
+        renewer = Thread(target=keep_renewing, name='lease-renewer', daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+
+    @contextmanager
+    def renewals_held(self) -> Iterator[None]:
+        """Hold background renewals while the block runs, e.g. a transaction watching the lock: PEXPIRE aborts it."""
+        with self._renewals:
+            yield
+
+    def release(self) -> None:
+        self._release(keys=[self.lock_key], args=[self.token])
@@ -1,16 +1,19 @@
 import logging
 import sys
 from os import environ
-from time import sleep
+from time import monotonic, sleep
 
-from journeys.app.repositories import FlightsHTTPRepository
+from journeys.app.repositories import FlightsHTTPRepository, FlightsSnapshotBackupRepository
+from journeys.core.materializers import JourneysMaterializer
+from journeys.core.models import RetentionWindow
 
-from cache_refresher.cache import RedisCacheRepository
+from cache_refresher.cache import CompositeCacheRepository, RedisCacheRepository, SnapshotFileCacheRepository
 from cache_refresher.cache_refresher import CacheRefresher
+from cache_refresher.leader import LeadershipLost, RedisLeaderElection
 
 logging.basicConfig(
     level=logging.DEBUG,
-    format="%(levelname)s: %(name)s",
+    format="%(levelname)s: %(name)s: %(message)s",
 )
 LOGGER = logging.getLogger('cache-refresher')
 
@@ -22,21 +25,88 @@ def main():
         LOGGER.info("Cache refresher disabled.")
         sys.exit(0)
     LOGGER.info("Cache refresher enabled.")
-    cache_refresher = CacheRefresher(
-        flights_repository=FlightsHTTPRepository(
-            provider_base_url=environ.get('FLIGHTS_PROVIDER_BASE_URL', ''),
-            endpoint=environ.get('FLIGHTS_PROVIDER_ENDPOINT_V1', ''),
-        ),
-        cache_repository=RedisCacheRepository(
+    leader_election = None
+    if int(environ.get('LEADER_ELECTION', 0)):
+        LOGGER.info("Leader election enabled.")
+        leader_election = RedisLeaderElection(
             repository_uri=environ.get('CACHE_URI', ''),
-            cache_key=environ.get('CACHE_KEY', ''),
+            lock_key=f"{environ.get('CACHE_KEY', '')}:REFRESHER_LEADER",
+            # Renewed every third of the interval, so a standby replica takes over within one interval.
+            lease_ms=int(cache_refresh_every) * 2000 // 3,
+        )
+    cache_repository = RedisCacheRepository(
+        repository_uri=environ.get('CACHE_URI', ''),
+        cache_key=environ.get('CACHE_KEY', ''),
+        leader_election=leader_election,
+    )
+    snapshot_path = environ.get('SNAPSHOT_PATH', '')
+    if snapshot_path:
+        LOGGER.info("Shared snapshot file enabled.")
+        cache_repository = CompositeCacheRepository(
+            cache_repository,
+            SnapshotFileCacheRepository(snapshot_path=snapshot_path),
+        )
+    flights_provider = FlightsHTTPRepository(
+        provider_base_url=environ.get('FLIGHTS_PROVIDER_BASE_URL', ''),
+        endpoint=environ.get('FLIGHTS_PROVIDER_ENDPOINT_V1', ''),
+        connect_timeout=float(environ.get('PROVIDER_CONNECT_TIMEOUT', 3.05)),
+        read_timeout=float(environ.get('PROVIDER_READ_TIMEOUT', 10)),
+        hedge_after=float(environ.get('PROVIDER_HEDGE_AFTER', 0)),
+        failure_threshold=int(environ.get('PROVIDER_FAILURE_THRESHOLD', 5)),
+        reset_timeout=float(environ.get('PROVIDER_RESET_TIMEOUT', 30)),
+    )
+    cache_refresher = CacheRefresher(
+        flights_repository=FlightsSnapshotBackupRepository(
+            flights_repository=flights_provider,
+            backup_path=environ.get('SNAPSHOT_BACKUP_PATH', ''),
+            # Published to the cache only when the provider fails, not over fresher data on every restart or failover.
+            serve_backup_first=False,
         ),
+        cache_repository=cache_repository,
+        journeys_materializer=JourneysMaterializer() if int(environ.get('MATERIALIZE_JOURNEYS', 0)) else None,
+        retention_window=RetentionWindow(
+            past_days=int(environ.get('RETENTION_PAST_DAYS', 1)),
+            future_days=int(environ.get('RETENTION_FUTURE_DAYS', 0)),
+        ) if int(environ.get('RETENTION_FUTURE_DAYS', 0)) else None,
     )
-    while True:
-        LOGGER.debug("Running cache_refresher.")
+    if leader_election is None:
+        while True:
+            refresh(cache_refresher, flights_provider)
+            sleep(int(cache_refresh_every))
+
+    next_refresh_at = 0.0
+    try:
+        while True:
+            if not leader_election.acquire_or_renew():
+                LOGGER.debug("Standing by, another replica is refreshing the cache.")
+                next_refresh_at = 0.0
+            elif monotonic() >= next_refresh_at:
+                next_refresh_at = monotonic() + int(cache_refresh_every)
+                try:
+                    with leader_election.renewing(every=int(cache_refresh_every) / 3):
+                        refresh(cache_refresher, flights_provider)
+                except LeadershipLost:
+                    LOGGER.warning("Leadership lost while refreshing, cache left untouched.")
+            sleep(int(cache_refresh_every) / 3)
+    finally:
+        leader_election.release()
+
+
+def refresh(cache_refresher: CacheRefresher, flights_provider: FlightsHTTPRepository) -> None:
+    LOGGER.debug("Running cache_refresher.")
+    try:
         cache_refresher.run()
-        LOGGER.debug("Cache refreshed.")
-        sleep(int(cache_refresh_every))
+    except LeadershipLost:
+        raise
+    except Exception:
+        # e.g. the provider failing before any good snapshot was fetched, the circuit breaker backs off meanwhile.
+        LOGGER.exception(
+            "Could not refresh cache, retrying on next interval. Flights provider metrics: %s.",
+            flights_provider.metrics(),
+        )
+        return
+    LOGGER.debug("Cache refreshed, snapshot age: %s seconds.", cache_refresher.flights_repository.get_snapshot_age())
+    LOGGER.debug("Flights provider metrics: %s.", flights_provider.metrics())
 
 
 if __name__ == '__main__':
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 
+from journeys.core.materializers import MaterializedJourneys
 from journeys.core.models import FlightEvent
 
 
@@ -8,5 +9,6 @@ class CacheRepository(ABC):
     repository_uri: str
 
     @abstractmethod
-    def refresh_cache(self, results: list[FlightEvent]) -> None:
+    def refresh_cache(self, results: list[FlightEvent], journeys: MaterializedJourneys | None = None) -> None:
+        """Replace the flights and, if given and the cache serves them, the journeys materialized from them at once."""
         pass
@@ -0,0 +1,50 @@
+import asyncio
+from contextlib import asynccontextmanager
+from time import monotonic
+from typing import AsyncIterator
+
+
+class Overloaded(Exception):
+    """The request can't be admitted now, it should be retried after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bound how many searches run at once in this worker, and how many may wait for a slot.
+
+    Requests arriving when every slot is taken and the queue is full, or that can't get a slot before their deadline,
+    are rejected right away instead of piling up until everything times out. A `max_concurrency` of 0 admits
+    everything.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: int):
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency or 1)
+        self._waiting = 0
+
+    @asynccontextmanager
+    async def admit(self, deadline: float | None = None) -> AsyncIterator[None]:
+        if not self._max_concurrency:
+            yield
+            return
+        if self._semaphore.locked() and self._waiting >= self._max_queue:
+            raise Overloaded(self._retry_after)
+
+        self._waiting += 1
+        try:
+            timeout = None if deadline is None else max(deadline - monotonic(), 0)
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded(self._retry_after)
+        finally:
+            self._waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
@@ -0,0 +1,24 @@
+import logging
+from logging.handlers import RotatingFileHandler
+
+SLOW_QUERY_LOGGER = 'journeys.slow_queries'
+
+
+def create_slow_query_logger(path: str, max_bytes: int, backup_count: int) -> logging.Logger:
+    """
+    Logger for slow query entries, written as they are (one JSON object per line) to a file rotated every `max_bytes`.
+
+    Without a `path`, entries are written to stderr next to the server logs instead, as the root logger is usually left
+    unconfigured and would drop them.
+    """
+    logger = logging.getLogger(SLOW_QUERY_LOGGER)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        if path:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        else:
+            handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    return logger
@@ -1,18 +1,64 @@
 from datetime import date, datetime
+from typing import Annotated
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, StringConstraints, model_validator
 
-from journeys.core.actions import SearchJourneys
+from journeys.core.actions import SearchJourneys, SearchRoundTrip
+
+MAX_STAY_DAYS = 30
+MAX_AIRPORTS = 20
+
+AirportCode = Annotated[str, StringConstraints(min_length=3, max_length=3)]
+
+
+def parse_airport_groups(value: str) -> dict[str, frozenset[str]]:
+    """Parse named airport groups configured as `NAME=CODE,CODE;NAME=CODE,CODE`, e.g. `LON=LHR,LGW,STN`."""
+    airport_groups = {}
+    for group in filter(None, (group.strip() for group in value.split(';'))):
+        name, _, codes = group.partition('=')
+        airport_groups[name.strip()] = frozenset(filter(None, (code.strip() for code in codes.split(','))))
+    return airport_groups
 
 
 class SearchJourneysRequest(BaseModel):
 
-    from_: str = Field(..., max_length=3, min_length=3)
-    to: str = Field(..., max_length=3, min_length=3)
+    from_: list[AirportCode] = Field(..., min_length=1, max_length=MAX_AIRPORTS)
+    to: list[AirportCode] = Field(..., min_length=1, max_length=MAX_AIRPORTS)
+    date: date
+
+    def get_action(self, deadline: float | None = None):
+        return SearchJourneys(**self.model_dump(), deadline=deadline)
+
+
+class SearchRoundTripRequest(BaseModel):
+    """Round trip search, returning on `return_date` or within `min_stay` and `max_stay` days after `date`."""
+
+    from_: list[AirportCode] = Field(..., min_length=1, max_length=MAX_AIRPORTS)
+    to: list[AirportCode] = Field(..., min_length=1, max_length=MAX_AIRPORTS)
     date: date
+    return_date: date | None = None
+    min_stay: int | None = Field(default=None, ge=0)
+    max_stay: int | None = Field(default=None, ge=0)
+    limit: int | None = Field(default=None, gt=0)
+
+    @model_validator(mode='after')
+    def check_return(self) -> 'SearchRoundTripRequest':
+        if self.return_date is not None:
+            if self.min_stay is not None or self.max_stay is not None:
+                raise ValueError('Either return_date or min_stay and max_stay must be given, not both.')
+            if self.return_date < self.date:
+                raise ValueError('return_date cannot be before date.')
+            self.min_stay = self.max_stay = (self.return_date - self.date).days
+        elif self.min_stay is None or self.max_stay is None:
+            raise ValueError('Either return_date or min_stay and max_stay must be given.')
+        elif self.min_stay > self.max_stay:
+            raise ValueError('min_stay cannot be greater than max_stay.')
+        if self.max_stay > MAX_STAY_DAYS:
+            raise ValueError(f'Return cannot be more than {MAX_STAY_DAYS} days after date.')
+        return self
 
-    def get_action(self):
-        return SearchJourneys(**self.model_dump())
+    def get_action(self, deadline: float | None = None):
+        return SearchRoundTrip(**self.model_dump(exclude={'return_date'}), deadline=deadline)
 
 
 class FlightEvent(BaseModel):
@@ -28,3 +74,9 @@ class SearchJourneysResponse(BaseModel):
 
     connections: int
     path: list[FlightEvent]
+
+
+class SearchRoundTripResponse(BaseModel):
+
+    outbound: SearchJourneysResponse
+    inbound: SearchJourneysResponse
@@ -0,0 +1,92 @@
+"""
+Process pool execution mode for CPU-heavy searches.
+
+Each worker process builds its own search handler once at startup and keeps it, repository and snapshot included, for
+its whole life. Only the action and the resulting journeys cross the process boundary, and the event loop of the API
+worker is never blocked by the search itself. Workers are spawned rather than forked, as the API process runs threads
+(e.g. the threadpool building the pool) whose locks a fork could copy while held.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from dataclasses import replace
+from time import monotonic
+from typing import Callable
+
+from journeys.core.actions import SearchJourneys
+from journeys.core.exceptions import SearchTimeout
+from journeys.core.handlers import SearchJourneysHandler
+from journeys.core.models import Journey
+
+LOGGER = logging.getLogger(__name__)
+
+_handler: SearchJourneysHandler | None = None
+
+
+def _initialize_worker(handler_factory: Callable[[], SearchJourneysHandler]) -> None:
+    global _handler
+    _handler = handler_factory()
+    try:
+        _handler.flights_repository.get_flight_events()
+    except Exception:
+        # A failing initializer would break the whole pool, the snapshot is loaded again on the first search.
+        LOGGER.exception("Could not pre-warm flight events in search worker.")
+
+
+def _warm_up() -> None:
+    pass
+
+
+def _search(action: SearchJourneys) -> list[Journey]:
+    return _handler(action)
+
+
+def _count_flight_events() -> int:
+    return len(_handler.flights_repository.get_flight_events())
+
+
+class ProcessPoolSearchJourneysHandler:
+    """
+    Run SearchJourneysHandler in a pre-warmed pool of worker processes.
+
+    Args:
+        handler_factory: picklable callable building the inline search handler inside each worker process.
+        pool_size: number of worker processes.
+        timeout: seconds to wait for a search before giving up on it. A search already running in a worker can't be
+            cancelled, so it's also given a deadline that far away (or its own, if sooner): the worker stops searching
+            once it's reached, checked between first legs, instead of staying busy while later searches queue up.
+    """
+
+    def __init__(
+            self,
+            handler_factory: Callable[[], SearchJourneysHandler],
+            pool_size: int,
+            timeout: float,
+    ):
+        self._timeout = timeout
+        self._executor = ProcessPoolExecutor(
+            max_workers=pool_size,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_initialize_worker,
+            initargs=(handler_factory,),
+        )
+        for _ in range(pool_size):
+            self._executor.submit(_warm_up)
+
+    def __call__(self, action: SearchJourneys) -> list[Journey]:
+        deadline = monotonic() + self._timeout
+        if action.deadline is None or deadline < action.deadline:
+            action = replace(action, deadline=deadline)
+        future = self._executor.submit(_search, action)
+        try:
+            return future.result(timeout=self._timeout)
+        except TimeoutError:
+            future.cancel()
+            raise SearchTimeout(action)
+
+    def count_flight_events(self) -> int:
+        """Number of flight events loaded by a worker process, waiting on it up to `timeout` seconds."""
+        return self._executor.submit(_count_flight_events).result(timeout=self._timeout)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,28 +1,96 @@
 import json
-from datetime import datetime
+import logging
+import os
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from http import HTTPStatus
+from threading import Lock, Thread
+from time import monotonic, time
+from typing import Any
 import requests
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-from redis import Redis
+from redis import Redis, RedisError
+from redis.cache import CacheConfig
 
-from journeys.core.models import FlightEvent
-from journeys.core.repositories import FlightsRepository
+from journeys.app.resilience import CircuitBreaker, HedgedCall
+from journeys.app.snapshots import MappedFlightEvents, snapshot_version, write_snapshot
+from journeys.core.actions import SearchJourneys
+from journeys.core.concurrency import SingleFlight
+from journeys.core.exceptions import FlightsProviderUnavailable
+from journeys.core.models import FlightEvent, Journey, RetentionWindow
+from journeys.core.repositories import FlightsRepository, JourneysRepository
+
+LOGGER = logging.getLogger(__name__)
+
+
+def snapshot_version_cache_key(cache_key: str) -> str:
+    """Redis key holding the version of the flight events cached by the cache refresher."""
+    return f'{cache_key}:VERSION'
+
+
+def journeys_cache_key(cache_key: str) -> str:
+    """Redis hash holding the journeys materialized by the cache refresher."""
+    return f'{cache_key}:JOURNEYS'
+
+
+def journeys_cache_field(from_: str, to: str, date_: date) -> str:
+    """Field of the materialized journeys hash for a given search."""
+    return f'{from_}:{to}:{date_.isoformat()}'
+
+
+def decode_flight_event(result: dict) -> FlightEvent:
+    """Build a flight event back from its cached JSON representation."""
+    return FlightEvent(
+        flight_number=result['flight_number'],
+        from_=result['from_'],
+        to=result['to'],
+        departure_time=datetime.fromisoformat(result['departure_time'].replace('Z', '+00:00')),
+        arrival_time=datetime.fromisoformat(result['arrival_time'].replace('Z', '+00:00')),
+    )
 
 
 @dataclass
 class FlightsHTTPRepository(FlightsRepository):
-    """Implement FlightsRepository interface with an HTTP provider."""
+    """
+    Implement FlightsRepository interface with an HTTP provider.
+
+    Requests have explicit connect and read timeouts, and non-200 responses are failures. When `hedge_after` is set,
+    a second request is fired if the first one didn't answer after that many seconds. After `failure_threshold`
+    consecutive failures the circuit breaker opens for `reset_timeout` seconds: the provider isn't called and the
+    last good flight events are served instead.
+    """
 
     provider_base_url: str
     endpoint: str
+    connect_timeout: float = 3.05
+    read_timeout: float = 10
+    hedge_after: float = 0
+    failure_threshold: int = 5
+    reset_timeout: float = 30
+    _circuit_breaker: CircuitBreaker = field(init=False, repr=False, compare=False)
+    _hedged_call: HedgedCall | None = field(init=False, repr=False, compare=False)
+    _last_good: list[FlightEvent] | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._circuit_breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        self._hedged_call = None
+        if self.hedge_after:
+            self._hedged_call = HedgedCall(ThreadPoolExecutor(max_workers=4), self.hedge_after)
 
     def get_flight_events(self) -> list[FlightEvent]:
-        response = requests.get(url=f'{self.provider_base_url}{self.endpoint}')
-        if response.status_code != HTTPStatus.OK:
-            pass
-        return [
+        if not self._circuit_breaker.allow():
+            return self._serve_last_good(FlightsProviderUnavailable('Circuit breaker is open.'))
+        try:
+            results = self._hedged_call(self._request) if self._hedged_call else self._request()
+        except Exception as error:
+            self._circuit_breaker.record_failure()
+            return self._serve_last_good(error)
+        self._circuit_breaker.record_success()
+
+        self._last_good = [
             FlightEvent(
                 flight_number=result['flight_number'],
                 from_=result['departure_city'],
@@ -30,29 +98,358 @@ class FlightsHTTPRepository(FlightsRepository):
                 departure_time=datetime.fromisoformat(result['departure_datetime'].replace('Z', '+00:00')),
                 arrival_time=datetime.fromisoformat(result['arrival_datetime'].replace('Z', '+00:00')),
             )
-            for result in response.json()
+            for result in results
         ]
+        return self._last_good
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            'circuit_breaker': self._circuit_breaker.state,
+            'hedges_fired': self._hedged_call.hedges_fired if self._hedged_call else 0,
+            'hedges_won': self._hedged_call.hedges_won if self._hedged_call else 0,
+        }
+
+    def _request(self) -> list[dict]:
+        response = requests.get(
+            url=f'{self.provider_base_url}{self.endpoint}',
+            timeout=(self.connect_timeout, self.read_timeout),
+        )
+        if response.status_code != HTTPStatus.OK:
+            raise FlightsProviderUnavailable(f'Provider answered {response.status_code}.')
+        return response.json()
+
+    def _serve_last_good(self, error: Exception) -> list[FlightEvent]:
+        if self._last_good is None:
+            raise error
+        LOGGER.warning("Flights provider unavailable (%s), serving last good flight events.", error)
+        return self._last_good
 
 
 class FlightsCacheRepository(FlightsRepository):
-    """Implement FlightsRepository interface with a Redis cache provider."""
+    """
+    Implement FlightsRepository interface with a Redis cache provider.
 
-    def __init__(self, repository_uri: str, cache_key: str):
-        self._connection = Redis.from_url(repository_uri)
-        self._connection.ping()
+    Concurrent calls share a single in-flight fetch and decode of the cached timetable. The decoded timetable is kept
+    along with its snapshot version, and only fetched again once the version key changes.
+
+    When `client_side_cache_size` is greater than 0, RESP3 client-side caching is enabled: Redis tracks the keys read
+    and pushes invalidations when they're written, so both the version and the raw timetable are served from a local
+    cache of up to that many entries until the cache refresher replaces them. Servers without RESP3 or key tracking,
+    or not supported by redis-py client-side caching, fall back to polling the version key.
+
+    Redis is connected to on first use rather than on creation, so wrappers like FlightsSnapshotBackupRepository can
+    be built and serve their backup while Redis is unavailable.
+    """
+
+    def __init__(self, repository_uri: str, cache_key: str, client_side_cache_size: int = 0):
+        self._repository_uri = repository_uri
+        self._client_side_cache_size = client_side_cache_size
+        self._connect_lock = Lock()
+        self._redis: Redis | None = None
         self._cache_key = cache_key
+        self._single_flight = SingleFlight()
+        self._decoded: tuple[bytes | None, bytes, list[FlightEvent]] | None = None  # version, raw value, decoded
+
+    @property
+    def _connection(self) -> Redis:
+        if self._redis is None:
+            with self._connect_lock:
+                if self._redis is None:
+                    self._redis = self._connect()
+        return self._redis
+
+    def _connect(self) -> Redis:
+        if self._client_side_cache_size:
+            connection = Redis.from_url(
+                self._repository_uri,
+                protocol=3,
+                cache_config=CacheConfig(max_size=self._client_side_cache_size),
+            )
+            try:
+                connection.ping()
+                return connection
+            except RedisError as error:
+                # e.g. a server older than Redis 7.4 refused by redis-py itself, if Redis is down the plain connection
+                # raises too.
+                LOGGER.warning("Client-side caching unavailable (%s), polling the snapshot version instead.", error)
+                connection.close()
+        connection = Redis.from_url(self._repository_uri)
+        connection.ping()
+        return connection
 
     def get_flight_events(self) -> list[FlightEvent]:
+        return self._single_flight.do(self._cache_key, self._load_flight_events)
+
+    def get_snapshot_version(self) -> str | None:
+        version = self._connection.get(snapshot_version_cache_key(self._cache_key))
+        return version.decode() if version is not None else None
+
+    def _load_flight_events(self) -> list[FlightEvent]:
+        version = self._connection.get(snapshot_version_cache_key(self._cache_key))
+        decoded = self._decoded
+        if decoded is not None and version is not None and decoded[0] == version:
+            return decoded[2]
         results = self._connection.get(self._cache_key)
         if results is None:
             return []
-        return [
-            FlightEvent(
-                flight_number=result['flight_number'],
-                from_=result['from_'],
-                to=result['to'],
-                departure_time=datetime.fromisoformat(result['departure_time'].replace('Z', '+00:00')),
-                arrival_time=datetime.fromisoformat(result['arrival_time'].replace('Z', '+00:00')),
+        if decoded is not None and decoded[1] is results:  # unchanged value served by the client-side cache
+            return decoded[2]
+        flight_events = [decode_flight_event(result) for result in json.loads(results)]
+        self._decoded = (version, results, flight_events)
+        return flight_events
+
+
+class JourneysCacheRepository(JourneysRepository):
+    """
+    Implement JourneysRepository interface with the journeys materialized in Redis by the cache refresher.
+
+    Redis is connected to on first use, and while it's unavailable journeys are reported as not materialized so they
+    get computed from the flights snapshot instead.
+    """
+
+    def __init__(self, repository_uri: str, cache_key: str):
+        self._connection = Redis.from_url(repository_uri)
+        self._journeys_key = journeys_cache_key(cache_key)
+
+    def get_journeys(self, action: SearchJourneys) -> list[Journey] | None:
+        try:
+            results = self._connection.hget(
+                self._journeys_key,
+                journeys_cache_field(action.from_, action.to, action.date),
             )
-            for result in json.loads(results)
+        except RedisError:
+            LOGGER.warning("Could not fetch materialized journeys, computing them.", exc_info=True)
+            return None
+        if results is None:
+            return None
+        return [
+            Journey(flight_events=[decode_flight_event(result) for result in journey])
+            for journey in json.loads(results)
         ]
+
+
+class FlightsSnapshotFileRepository(FlightsRepository):
+    """
+    Implement FlightsRepository interface with a memory-mapped snapshot file written by the cache refresher.
+
+    Every worker process maps the same file read-only, so the timetable lives once in the page cache no matter how
+    many workers run on the host. The file is remapped whenever the refresher atomically replaces it.
+    """
+
+    def __init__(self, snapshot_path: str):
+        self._snapshot_path = snapshot_path
+        self._lock = Lock()
+        self._file_id: tuple[int, int] | None = None
+        self._flight_events: Sequence[FlightEvent] = []
+        self._version: str | None = None
+
+    def get_flight_events(self) -> Sequence[FlightEvent]:
+        try:
+            stat = os.stat(self._snapshot_path)
+        except FileNotFoundError:
+            return []
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id != self._file_id:
+            with self._lock:
+                if file_id != self._file_id:
+                    self._flight_events = MappedFlightEvents(self._snapshot_path)
+                    self._version = self._flight_events.version
+                    self._file_id = file_id
+        return self._flight_events
+
+    def get_snapshot_version(self) -> str | None:
+        self.get_flight_events()
+        return self._version
+
+    def get_snapshot_age(self) -> float | None:
+        try:
+            return time() - os.stat(self._snapshot_path).st_mtime
+        except FileNotFoundError:
+            return None
+
+
+class FlightsInMemoryCacheRepository(FlightsRepository):
+    """
+    Implement FlightsRepository interface with an in-process stale-while-revalidate cache.
+
+    Wraps another repository (e.g. the HTTP provider) and keeps its last result in memory. Only the very first call
+    waits on the wrapped repository. Once the snapshot is older than `ttl` seconds it keeps being served while a
+    single background thread fetches a fresh one. Its version is the one of the wrapped repository when known, so it
+    still names the backup file flights came from, and the hash of the flights held otherwise.
+    """
+
+    def __init__(self, flights_repository: FlightsRepository, ttl: float):
+        self._flights_repository = flights_repository
+        self._ttl = ttl
+        self._lock = Lock()
+        self._flight_events: list[FlightEvent] | None = None
+        self._version: str | None = None
+        self._expires_at = 0.0
+        self._revalidating = False
+
+    def get_flight_events(self) -> list[FlightEvent]:
+        if self._flight_events is None:
+            with self._lock:
+                if self._flight_events is None:
+                    self._store(self._flights_repository.get_flight_events())
+        elif monotonic() >= self._expires_at:
+            self._revalidate_in_background()
+        return self._flight_events
+
+    def get_snapshot_version(self) -> str | None:
+        """Version of the snapshot currently held, it never triggers a load."""
+        return self._version
+
+    def get_snapshot_age(self) -> float | None:
+        return self._flights_repository.get_snapshot_age()
+
+    def _store(self, flight_events: list[FlightEvent]) -> None:
+        self._version = self._flights_repository.get_snapshot_version() or snapshot_version(flight_events)
+        self._flight_events = flight_events
+        self._expires_at = monotonic() + self._ttl
+
+    def _revalidate_in_background(self) -> None:
+        with self._lock:
+            if self._revalidating:
+                return
+            self._revalidating = True
+        Thread(target=self._revalidate, daemon=True).start()
+
+    def _revalidate(self) -> None:
+        try:
+            self._store(self._flights_repository.get_flight_events())
+        except Exception:
+            LOGGER.exception("Could not revalidate flight events, serving stale snapshot.")
+            self._expires_at = monotonic() + self._ttl
+        finally:
+            self._revalidating = False
+
+
+class FlightsRetentionRepository(FlightsRepository):
+    """
+    Prune flights departing outside the retention window from another repository, if any window is set.
+
+    The pruned flights are kept and returned as the same object until the wrapped repository returns another snapshot
+    object or the window moves, so searches neither prune nor index them again in between.
+    """
+
+    def __init__(self, flights_repository: FlightsRepository, retention_window: RetentionWindow | None):
+        self._flights_repository = flights_repository
+        self._retention_window = retention_window
+        self._pruned: tuple[Sequence[FlightEvent], tuple[date, date], list[FlightEvent]] | None = None
+
+    def get_flight_events(self) -> Sequence[FlightEvent]:
+        flight_events = self._flights_repository.get_flight_events()
+        if self._retention_window is None:
+            return flight_events
+        bounds = self._retention_window.bounds()
+        pruned = self._pruned
+        if pruned is not None and pruned[0] is flight_events and pruned[1] == bounds:
+            return pruned[2]
+        pruned_flight_events = self._retention_window.prune(flight_events)
+        self._pruned = (flight_events, bounds, pruned_flight_events)
+        return pruned_flight_events
+
+    def get_snapshot_version(self) -> str | None:
+        snapshot_version = self._flights_repository.get_snapshot_version()
+        if snapshot_version is None or self._retention_window is None:
+            return snapshot_version
+        first_date, last_date = self._retention_window.bounds()
+        return f'{snapshot_version}:{first_date.isoformat()}:{last_date.isoformat()}'
+
+    def get_snapshot_age(self) -> float | None:
+        return self._flights_repository.get_snapshot_age()
+
+
+class FlightsSnapshotBackupRepository(FlightsRepository):
+    """
+    Keep the last good flight events of another repository in a local snapshot file.
+
+    The backup is served on the first call, so restarts don't wait on the network, and whenever the wrapped repository
+    fails or returns no flights (e.g. Redis was flushed, or the provider is down). Every other call goes to the wrapped
+    repository, and its results replace the backup atomically when they changed. With `serve_backup_first` false the
+    backup is only served on failures, e.g. for writers that must not publish it over fresher data on every restart.
+    When the wrapped repository has no snapshot version, the hash of the flights last served (i.e. of the backup file)
+    is reported instead. Without `backup_path` it just forwards calls.
+    """
+
+    def __init__(self, flights_repository: FlightsRepository, backup_path: str, serve_backup_first: bool = True):
+        self._flights_repository = flights_repository
+        self._backup_path = backup_path
+        self._lock = Lock()
+        self._backup: Sequence[FlightEvent] | None = None
+        self._backup_version: str | None = None
+        self._source_version: str | None = None
+        self._served_version: str | None = None
+        self._serving_backup = False
+        self._fetched_at: float | None = None
+        if backup_path and os.path.exists(backup_path):
+            self._backup = MappedFlightEvents(backup_path)
+            self._backup_version = self._backup.version
+            if serve_backup_first:
+                self._served_version = self._backup_version
+                self._serving_backup = True
+
+    def get_flight_events(self) -> Sequence[FlightEvent]:
+        if not self._backup_path:
+            return self._flights_repository.get_flight_events()
+        if self._serving_backup and self._fetched_at is None:
+            self._fetched_at = os.stat(self._backup_path).st_mtime
+            return self._backup
+
+        try:
+            source_version = self._flights_repository.get_snapshot_version()
+            flight_events = self._flights_repository.get_flight_events()
+        except Exception:
+            if self._backup is None:
+                raise
+            LOGGER.exception("Could not fetch flight events, serving local backup.")
+            return self._serve_backup()
+        if not flight_events:
+            return self._serve_backup() if self._backup is not None else flight_events
+
+        self._serving_backup = False
+        self._fetched_at = time()
+        with self._lock:  # concurrent calls seeing the same new version hash and persist it once
+            if source_version is None or source_version != self._source_version:
+                self._persist(flight_events)
+                self._source_version = source_version
+        return flight_events
+
+    def get_snapshot_version(self) -> str | None:
+        if not self._backup_path:
+            return self._flights_repository.get_snapshot_version()
+        if self._serving_backup and self._fetched_at is None:
+            return self._backup_version
+        try:
+            version = self._flights_repository.get_snapshot_version()
+        except Exception:
+            if self._backup is None:
+                raise
+            LOGGER.warning("Could not fetch snapshot version, serving local backup.", exc_info=True)
+            self._serve_backup()
+            return self._backup_version
+        return version if version is not None else self._served_version
+
+    def get_snapshot_age(self) -> float | None:
+        return None if self._fetched_at is None else time() - self._fetched_at
+
+    def _serve_backup(self) -> Sequence[FlightEvent]:
+        if not self._serving_backup:
+            self._serving_backup = True
+            self._served_version = self._backup_version
+            self._fetched_at = os.stat(self._backup_path).st_mtime
+        return self._backup
+
+    def _persist(self, flight_events: Sequence[FlightEvent]) -> None:
+        """Replace the backup if the content changed, it hashes `flight_events`: call it on source changes, locked."""
+        version = self._served_version = snapshot_version(flight_events)
+        if version == self._backup_version:
+            return
+        try:
+            write_snapshot(self._backup_path, flight_events)
+        except OSError:
+            LOGGER.exception("Could not persist local backup of flight events.")
+            return
+        self._backup = MappedFlightEvents(self._backup_path)
+        self._backup_version = version
@@ -0,0 +1,82 @@
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing dependency for a while.
+
+    The circuit opens after `failure_threshold` consecutive failures. Once `reset_timeout` seconds passed it's
+    half-open: calls are allowed again, the first success closes it and a failure opens it right away.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if monotonic() - self._opened_at >= self._reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        return self.state != self.OPEN
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self._failure_threshold:
+                self._opened_at = monotonic()
+
+
+class HedgedCall:
+    """
+    Call a function and, if it didn't finish after `hedge_after` seconds, call it a second time concurrently.
+
+    The first successful result wins, the losing call is left to finish in background. Counts of hedges fired and won
+    are kept as metrics.
+    """
+
+    def __init__(self, executor: Executor, hedge_after: float):
+        self._executor = executor
+        self._hedge_after = hedge_after
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def __call__(self, function: Callable[[], Any]) -> Any:
+        first = self._executor.submit(function)
+        done, _ = wait([first], timeout=self._hedge_after)
+        if done:
+            return first.result()
+
+        self.hedges_fired += 1
+        hedge = self._executor.submit(function)
+        pending = {first, hedge}
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is hedge:
+                    self.hedges_won += 1
+                return future.result()
+        raise error
@@ -0,0 +1,125 @@
+"""
+Fixed-layout binary snapshots of flight events.
+
+A snapshot file is a header followed by fixed-size records, so it can be memory-mapped read-only and shared by every
+worker process on a host: records are decoded on access instead of every worker holding its own decoded copy.
+Writers replace the file atomically, readers holding the previous mapping keep reading it until they remap.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from struct import Struct
+
+from journeys.core.models import FlightEvent
+
+MAGIC = b'KIUSNAP\x00'
+FORMAT_VERSION = 1
+HEADER = Struct('<8sHxxI')  # magic, format version, records count
+RECORD = Struct('<8s3s3sqqhh')  # flight number, from, to, departure, arrival, departure offset, arrival offset
+NAIVE = -32768  # utc offset sentinel for naive datetimes
+EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidSnapshot(Exception):
+    """The file is not a snapshot in the expected binary layout."""
+
+
+def _pack_datetime(value: datetime) -> tuple[int, int]:
+    offset = value.utcoffset()
+    seconds = (value.replace(tzinfo=None) - EPOCH) // timedelta(seconds=1)
+    return seconds, NAIVE if offset is None else offset // timedelta(minutes=1)
+
+
+def _unpack_datetime(seconds: int, offset: int) -> datetime:
+    value = EPOCH + timedelta(seconds=seconds)
+    return value if offset == NAIVE else value.replace(tzinfo=timezone(timedelta(minutes=offset)))
+
+
+def encode_snapshot(flight_events: Sequence[FlightEvent]) -> bytes:
+    """Encode flight events into the snapshot binary layout."""
+    buffer = bytearray(HEADER.size + RECORD.size * len(flight_events))
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, len(flight_events))
+    for position, flight_event in enumerate(flight_events):
+        departure, departure_offset = _pack_datetime(flight_event.departure_time)
+        arrival, arrival_offset = _pack_datetime(flight_event.arrival_time)
+        RECORD.pack_into(
+            buffer,
+            HEADER.size + RECORD.size * position,
+            flight_event.flight_number.encode(),
+            flight_event.from_.encode(),
+            flight_event.to.encode(),
+            departure,
+            arrival,
+            departure_offset,
+            arrival_offset,
+        )
+    return bytes(buffer)
+
+
+def snapshot_version(flight_events: Sequence[FlightEvent]) -> str:
+    """Content hash of flight events, equal for equal timetables across processes and hosts."""
+    return hashlib.sha1(encode_snapshot(flight_events)).hexdigest()
+
+
+def write_snapshot(path: str, flight_events: Sequence[FlightEvent]) -> None:
+    """Write a snapshot file atomically, readers see either the previous or the new snapshot but never a partial one."""
+    directory, name = os.path.split(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f'{name}.', suffix='.tmp', delete=False) as file:
+        file.write(encode_snapshot(flight_events))
+        file.flush()
+        os.fsync(file.fileno())
+    try:
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, path)
+    except OSError:
+        os.unlink(file.name)
+        raise
+
+
+class MappedFlightEvents(Sequence):
+    """Read-only sequence of flight events backed by a memory-mapped snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buffer) < HEADER.size:
+            raise InvalidSnapshot(path)
+        magic, version, self._count = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or len(self._buffer) != HEADER.size + RECORD.size * self._count:
+            raise InvalidSnapshot(path)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def version(self) -> str:
+        """Same as snapshot_version() of the decoded flight events, as the file is exactly their encoding."""
+        return hashlib.sha1(self._buffer).hexdigest()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._decode(HEADER.size + RECORD.size * index)
+
+    def __iter__(self):
+        for offset in range(HEADER.size, HEADER.size + RECORD.size * self._count, RECORD.size):
+            yield self._decode(offset)
+
+    def _decode(self, offset: int) -> FlightEvent:
+        flight_number, from_, to, departure, arrival, departure_offset, arrival_offset = RECORD.unpack_from(
+            self._buffer, offset,
+        )
+        return FlightEvent(
+            flight_number=flight_number.rstrip(b'\x00').decode(),
+            from_=from_.decode(),
+            to=to.decode(),
+            departure_time=_unpack_datetime(departure, departure_offset),
+            arrival_time=_unpack_datetime(arrival, arrival_offset),
+        )
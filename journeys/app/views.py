@@ -1,10 +1,28 @@
+import hashlib
 from datetime import date
+from http import HTTPStatus
+from time import monotonic
+from typing import Any
 
 from dependency_injector.wiring import inject, Provide
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 
-from journeys.app.models import FlightEvent, SearchJourneysRequest, SearchJourneysResponse
+from journeys.app.admission import AdmissionController, Overloaded
+from journeys.app.models import (
+    FlightEvent,
+    SearchJourneysRequest,
+    SearchJourneysResponse,
+    SearchRoundTripRequest,
+    SearchRoundTripResponse,
+)
+from journeys.app.repositories import FlightsHTTPRepository
+from journeys.core.actions import Airports
+from journeys.core.exceptions import SearchDeadlineExceeded, SearchOutOfRetentionWindow, SearchTimeout
 from journeys.core.models import Journey
+from journeys.core.repositories import FlightsRepository
 from journeys.containers import JourneysContainer, JourneysCommandBus
 
 router = APIRouter(
@@ -12,44 +30,270 @@ router = APIRouter(
     tags=['journeys'],
 )
 
+health_router = APIRouter(
+    tags=['health'],
+)
+
+
+def _build_etag(snapshot_version: str, *query: Any) -> str:
+    """Weak ETag for a search, so it stays valid once the response is compressed."""
+    key = ':'.join(str(part) for part in (snapshot_version, *query))
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+
+def _airports_key(airports: Airports) -> str:
+    return airports if isinstance(airports, str) else ','.join(sorted(airports))
+
+
+def _expand_airports(airports: str, airport_groups: dict[str, frozenset[str]]) -> list[str]:
+    """Split comma separated airport codes, replacing airport group names by their airports."""
+    codes = []
+    for code in (code.strip() for code in airports.split(',')):
+        codes.extend(sorted(airport_groups.get(code, (code,))))
+    return codes
+
+
+def _etag_matches(etag: str, if_none_match: str | None) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')}
+    return '*' in candidates or etag.removeprefix('W/') in candidates
+
+
+async def _search(
+        action: Any,
+        query: tuple[Any, ...],
+        response: Response,
+        if_none_match: str | None,
+        command_bus: JourneysCommandBus,
+        flights_repository: FlightsRepository,
+        cache_max_age: int,
+        admission_controller: AdmissionController,
+) -> list[Any] | Response:
+    """
+    Handle a search action the way every search endpoint does.
+
+    When the flights snapshot version is known, the response carries an ETag tied to
+    the `query` and that version, and a matching If-None-Match is answered with 304
+    before running the search.
+
+    Under overload the search is rejected with 503 and Retry-After. When it reaches
+    its deadline, the results found until then are returned flagged with an
+    `X-Partial-Results` header, or 504 if none were found.
+    """
+    snapshot_version = await run_in_threadpool(flights_repository.get_snapshot_version)
+    if snapshot_version is not None:
+        headers = {
+            'ETag': _build_etag(snapshot_version, *query),
+            'Cache-Control': f'public, max-age={cache_max_age}',
+        }
+        if _etag_matches(headers['ETag'], if_none_match):
+            return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+    try:
+        async with admission_controller.admit(deadline=action.deadline):
+            return await command_bus.handle_async(action)
+    except Overloaded as overloaded:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Too many searches in progress.',
+            headers={'Retry-After': str(overloaded.retry_after)},
+        )
+    except SearchDeadlineExceeded as deadline_exceeded:
+        if not deadline_exceeded.journeys:
+            raise HTTPException(status_code=HTTPStatus.GATEWAY_TIMEOUT, detail='Search timed out.')
+        del response.headers['ETag']
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Partial-Results'] = 'true'
+        return deadline_exceeded.journeys
+    except SearchOutOfRetentionWindow:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='Date is outside the searchable window.')
+    except SearchTimeout:
+        raise HTTPException(status_code=HTTPStatus.GATEWAY_TIMEOUT, detail='Search timed out.')
+
+
+def _to_response(journey: Journey) -> SearchJourneysResponse:
+    return SearchJourneysResponse(
+        connections=journey.connections,
+        path=[FlightEvent(
+            **{
+                'flight_number': flight_event.flight_number,
+                'from': flight_event.from_,
+                'to': flight_event.to,
+                'departure_time': flight_event.departure_time,
+                'arrival_time': flight_event.arrival_time,
+            }
+        ) for flight_event in journey.flight_events],
+    )
+
+
 @router.get('/search', response_model=list[SearchJourneysResponse])
 @inject
 async def search_journeys(
         date: date,
         origin: str,
         destination: str,
+        response: Response,
+        if_none_match: str | None = Header(default=None),
         command_bus: JourneysCommandBus = Depends(Provide[JourneysContainer.command_bus]),
+        flights_repository: FlightsRepository = Depends(Provide[JourneysContainer.flights_repository]),
+        cache_max_age: int = Depends(Provide[JourneysContainer.config.cache_max_age]),
+        admission_controller: AdmissionController = Depends(Provide[JourneysContainer.admission_controller]),
+        search_deadline: float = Depends(Provide[JourneysContainer.config.search_deadline]),
+        airport_groups: dict[str, frozenset[str]] = Depends(Provide[JourneysContainer.airport_groups]),
 ):
     """
     Search journeys available for given date, with the right origin and destinations.
 
+    Several airports can be searched at once, from any of them and to any of them,
+    as comma separated codes or the name of an airport group configured in
+    AIRPORT_GROUPS. Responses carry an ETag and are answered with 304, 503, 504 or
+    partial results as described in `_search`.
+
     Args:
         date (date): The desired date of departure.
-        origin (str): 3-character code indicating city of departure.
-        destination (str): 3-character code indicating city of destination.
+        origin (str): 3-character code indicating city of departure, comma separated
+            codes or an airport group name.
+        destination (str): 3-character code indicating city of destination, comma
+            separated codes or an airport group name.
 
     Returns:
         list[SearchJourneysResponse]: n possible journeys, from which each of these
         can have 1 or 2 flight events connected.
     """
-    action = SearchJourneysRequest(
-        from_=origin,
-        to=destination,
-        date=date,
-    ).get_action()
-    results: list[Journey] = command_bus.handle(action)
+    try:
+        action = SearchJourneysRequest(
+            from_=_expand_airports(origin, airport_groups),
+            to=_expand_airports(destination, airport_groups),
+            date=date,
+        ).get_action(deadline=monotonic() + search_deadline if search_deadline else None)
+    except ValidationError as error:
+        raise RequestValidationError(error.errors())
+    results = await _search(
+        action,
+        (_airports_key(action.from_), _airports_key(action.to), action.date.isoformat()),
+        response,
+        if_none_match,
+        command_bus,
+        flights_repository,
+        cache_max_age,
+        admission_controller,
+    )
+    if isinstance(results, Response):
+        return results
+    return [_to_response(result) for result in results]
+
+
+@router.get('/round-trip', response_model=list[SearchRoundTripResponse])
+@inject
+async def search_round_trip(
+        date: date,
+        origin: str,
+        destination: str,
+        response: Response,
+        return_date: date | None = None,
+        min_stay: int | None = None,
+        max_stay: int | None = None,
+        limit: int | None = None,
+        if_none_match: str | None = Header(default=None),
+        command_bus: JourneysCommandBus = Depends(Provide[JourneysContainer.command_bus]),
+        flights_repository: FlightsRepository = Depends(Provide[JourneysContainer.flights_repository]),
+        cache_max_age: int = Depends(Provide[JourneysContainer.config.cache_max_age]),
+        admission_controller: AdmissionController = Depends(Provide[JourneysContainer.admission_controller]),
+        search_deadline: float = Depends(Provide[JourneysContainer.config.search_deadline]),
+        airport_groups: dict[str, frozenset[str]] = Depends(Provide[JourneysContainer.airport_groups]),
+):
+    """
+    Search outbound and return journeys in a single request, paired as round trips.
+
+    Both directions are searched against the same flights snapshot. Origin and
+    destination accept several airports as `/journeys/search` does. Responses carry an
+    ETag and are answered with 304, 503, 504 or partial results as described in `_search`.
+
+    Args:
+        date (date): The desired date of departure.
+        origin (str): 3-character code indicating city of departure.
+        destination (str): 3-character code indicating city of destination.
+        return_date (date | None): The desired date of return.
+        min_stay (int | None): Days after `date` to return from, when `return_date` isn't given.
+        max_stay (int | None): Days after `date` to return until, when `return_date` isn't given.
+        limit (int | None): Max round trips returned, all of them if not given.
+
+    Returns:
+        list[SearchRoundTripResponse]: n possible round trips, each one with an outbound
+        journey and a return journey departing after the outbound one arrived.
+    """
+    try:
+        action = SearchRoundTripRequest(
+            from_=_expand_airports(origin, airport_groups),
+            to=_expand_airports(destination, airport_groups),
+            date=date,
+            return_date=return_date,
+            min_stay=min_stay,
+            max_stay=max_stay,
+            limit=limit,
+        ).get_action(deadline=monotonic() + search_deadline if search_deadline else None)
+    except ValidationError as error:
+        raise RequestValidationError(error.errors())
+    results = await _search(
+        action,
+        (
+            _airports_key(action.from_),
+            _airports_key(action.to),
+            action.date.isoformat(),
+            action.min_stay,
+            action.max_stay,
+            action.limit,
+        ),
+        response,
+        if_none_match,
+        command_bus,
+        flights_repository,
+        cache_max_age,
+        admission_controller,
+    )
+    if isinstance(results, Response):
+        return results
     return [
-        SearchJourneysResponse(
-            connections=result.connections,
-            path=[FlightEvent(
-                **{
-                    'flight_number': flight_event.flight_number,
-                    'from': flight_event.from_,
-                    'to': flight_event.to,
-                    'departure_time': flight_event.departure_time,
-                    'arrival_time': flight_event.arrival_time,
-                }
-            ) for flight_event in result.flight_events],
-        )
+        SearchRoundTripResponse(outbound=_to_response(result.outbound), inbound=_to_response(result.inbound))
         for result in results
     ]
+
+
+@health_router.get('/ready')
+@inject
+async def ready(
+        request: Request,
+        response: Response,
+        flights_repository: FlightsRepository = Depends(Provide[JourneysContainer.flights_repository]),
+):
+    """
+    Report whether the flights snapshot was preloaded and searches can be served without waiting on it.
+
+    Returns:
+        dict: `ready` flag, with a 503 status code while still preloading, and
+        `snapshot_age`, seconds since the snapshot served was fetched (None if unknown).
+    """
+    is_ready = getattr(request.app.state, 'ready', False)
+    if not is_ready:
+        response.status_code = HTTPStatus.SERVICE_UNAVAILABLE
+    snapshot_age = flights_repository.get_snapshot_age() if is_ready else None
+    return {'ready': is_ready, 'snapshot_age': snapshot_age}
+
+
+@health_router.get('/metrics')
+@inject
+async def metrics(
+        flights_source: str = Depends(Provide[JourneysContainer.config.flights_source]),
+        flights_provider: FlightsHTTPRepository = Depends(Provide[JourneysContainer.flights_provider.provider]),
+):
+    """
+    Report the flights provider resilience metrics.
+
+    Returns:
+        dict: `flights_provider` with the circuit breaker state and the hedged requests fired and won,
+        None when this API doesn't call the provider itself (the cache refresher does).
+    """
+    if flights_source != 'in_memory':
+        return {'flights_provider': None}
+    return {'flights_provider': flights_provider().metrics()}
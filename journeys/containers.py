@@ -1,33 +1,61 @@
 """Declarative IoC layer."""
-from os import environ
+from functools import partial
 from typing import Any
 
+from anyio import to_thread
 from dependency_injector.containers import DeclarativeContainer, WiringConfiguration
-from dependency_injector.providers import Configuration, Factory
+from dependency_injector.providers import Callable, Configuration, Factory, Object, Provider, Selector, Singleton
 
-from journeys.app.repositories import FlightsHTTPRepository, FlightsCacheRepository
-from journeys.core.actions import SearchJourneys
-from journeys.core.handlers import SearchJourneysHandler
-from journeys.core.repositories import FlightsRepository
+from journeys.app.admission import AdmissionController
+from journeys.app.logs import create_slow_query_logger
+from journeys.app.models import parse_airport_groups
+from journeys.app.pool import ProcessPoolSearchJourneysHandler
+from journeys.app.repositories import (
+    FlightsCacheRepository,
+    FlightsHTTPRepository,
+    FlightsInMemoryCacheRepository,
+    FlightsRetentionRepository,
+    FlightsSnapshotBackupRepository,
+    FlightsSnapshotFileRepository,
+    JourneysCacheRepository,
+)
+from journeys.core.actions import SearchJourneys, SearchRoundTrip
+from journeys.core.handlers import SearchJourneysHandler, SearchRoundTripHandler
+from journeys.core.middlewares import (
+    CommandMiddleware,
+    DeduplicationMiddleware,
+    ResultCacheMiddleware,
+    RetentionWindowMiddleware,
+    SlowQueryLogMiddleware,
+    TimingMiddleware,
+)
+from journeys.core.models import RetentionWindow
+from journeys.core.repositories import FlightsRepository, JourneysRepository
 
 
 class JourneysCommandBus:
     """
     A lightweight command bus for dispatching actions to their handlers.
 
-    This bus maps action types to corresponding handler factories. When an
-    action is handled, the bus instantiates the appropriate handler and
-    invokes it with the given action.
+    This bus maps action types to corresponding handler providers. When an
+    action is handled, the bus gets the appropriate handler from its provider
+    and invokes it with the given action, through the middlewares registered
+    for that action type. Handler lifecycles follow their providers: a Factory
+    builds a handler per call while a Singleton reuses the same one.
 
     Attributes:
-        _commands (dict[str, Any]): A registry mapping action class names to handler factories.
+        _commands (dict[str, Any]): A registry mapping action class names to handler providers.
+        _middlewares (dict[str, list[CommandMiddleware]]): A registry mapping action class names
+            to the middlewares wrapping their handler, outermost first.
     """
 
-    _commands: dict[str, Any] = {}
-
-    def __init__(self, bus: dict[Any, Any]):
+    def __init__(self, bus: dict[Any, Any], middlewares: dict[Any, list[Any]] | None = None):
+        self._commands: dict[str, Any] = {}
+        self._middlewares: dict[str, list[CommandMiddleware]] = {}
         for action, handler in bus.items():
-            JourneysCommandBus._commands[action.provides.__name__] = handler
+            self._commands[action.provides.__name__] = handler
+        for action, action_middlewares in (middlewares or {}).items():
+            self._middlewares[action.provides.__name__] = [middleware() for middleware in action_middlewares]
 
     def handle(self, action) -> Any:
         """
@@ -39,8 +67,34 @@ class JourneysCommandBus:
         Returns:
             Any: The result of executing the action’s handler.
         """
-        command = JourneysCommandBus._commands[action.__class__.__name__]()
-        return command(action)
+        action_name = action.__class__.__name__
+        command = self._commands[action_name]
+
+        def pipeline(action_: Any) -> Any:
+            return command()(action_)
+
+        for middleware in reversed(self._middlewares.get(action_name, [])):
+            pipeline = partial(middleware, next_=pipeline)
+        return pipeline(action)
+
+    async def handle_async(self, action) -> Any:
+        """
+        Dispatch an action from async code, without blocking the event loop while it's handled.
+
+        Args:
+            action (Any): The action instance to be processed.
+
+        Returns:
+            Any: The result of executing the action’s handler.
+        """
+        return await to_thread.run_sync(self.handle, action)
+
+
+def create_worker_search_handler(config: dict[str, Any]) -> SearchJourneysHandler:
+    """Build the inline search handler inside a search pool worker process, from the API configuration."""
+    container = JourneysContainer()
+    container.config.from_dict({**config, 'search_mode': 'inline'})
+    return container.search_journeys_handler()
 
 
 class JourneysContainer(DeclarativeContainer):
@@ -53,10 +107,35 @@ class JourneysContainer(DeclarativeContainer):
 
     Attributes:
         config (Configuration): Holds service configuration parameters.
-        flights_repository (Factory[FlightsRepository]): Factory for
-            creating a journeys repository backed by an HTTP provider.
-        command_bus (Factory[JourneysCommandBus]): Factory for the command bus,
-            mapping actions to their handlers.
+        retention_window (Provider[RetentionWindow | None]): Span of departure
+            dates flights are kept and searched for, when RETENTION_FUTURE_DAYS
+            is greater than 0.
+        flights_provider (Provider[FlightsHTTPRepository]): The HTTP flights
+            provider, with timeouts, optional hedged requests and a circuit
+            breaker serving the last good flight events while it's open.
+        flights_repository (Provider[FlightsRepository]): Provider for the
+            journeys repository, selected by `config.flights_source`: the Redis
+            warm cache when the cache refresher is enabled (or the shared
+            memory-mapped snapshot file it writes, when SNAPSHOT_PATH is set), or
+            an in-process stale-while-revalidate cache in front of the HTTP
+            provider otherwise. Flights outside the retention window are pruned
+            on load (the refresher already prunes the snapshot file), and the
+            last good snapshot is kept in SNAPSHOT_BACKUP_PATH when set.
+        journeys_repository (Provider[JourneysRepository | None]): Journeys
+            materialized by the cache refresher, selected by
+            `config.journeys_source` when MATERIALIZE_JOURNEYS is set.
+        search_journeys_handler (Selector): Runs searches inline, with a
+            singleton or per-call handler depending on HANDLER_LIFECYCLE, or in
+            a pre-warmed process pool when SEARCH_POOL_SIZE is greater than 0.
+        search_round_trip_handler (Selector): Runs round trip searches inline,
+            with a singleton or per-call handler depending on HANDLER_LIFECYCLE.
+        command_bus (Singleton[JourneysCommandBus]): The command bus, mapping
+            actions to their handlers and middlewares (timing, retention window
+            checks, deduplication of in-flight actions, result caching and
+            logging searches slower than SLOW_QUERY_THRESHOLD).
+        airport_groups (Singleton[dict[str, frozenset[str]]]): Named groups of
+            airports from AIRPORT_GROUPS, searchable by name as origin or
+            destination.
     """
     wiring_config = WiringConfiguration(modules=[
         'journeys.app.models',
@@ -65,23 +144,166 @@ class JourneysContainer(DeclarativeContainer):
     ])
     config = Configuration()
 
-    use_cache = bool(int(environ.get('CACHE_REFRESH_EVERY', 0)))
-    flights_repository: Factory[FlightsRepository] = Factory(
-        FlightsCacheRepository,
-        repository_uri=config.cache_uri,
-        cache_key=config.cache_key,
-    ) if use_cache else Factory(
+    retention_window: Provider[RetentionWindow | None] = Selector(
+        config.retention,
+        enabled=Singleton(
+            RetentionWindow,
+            past_days=config.retention_past_days,
+            future_days=config.retention_future_days,
+        ),
+        disabled=Object(None),
+    )
+
+    flights_provider: Provider[FlightsHTTPRepository] = Singleton(
         FlightsHTTPRepository,
         provider_base_url=config.flights_provider_base_url,
         endpoint=config.flights_provider_endpoint_v1,
+        connect_timeout=config.provider_connect_timeout,
+        read_timeout=config.provider_read_timeout,
+        hedge_after=config.provider_hedge_after,
+        failure_threshold=config.provider_failure_threshold,
+        reset_timeout=config.provider_reset_timeout,
     )
 
-    command_bus: Factory[JourneysCommandBus] = Factory(
-        JourneysCommandBus,
-        {
-            Factory(SearchJourneys): Factory(
+    flights_repository: Provider[FlightsRepository] = Selector(
+        config.flights_source,
+        snapshot_file=Singleton(
+            FlightsSnapshotFileRepository,
+            snapshot_path=config.snapshot_path,
+        ),
+        cache=Singleton(
+            FlightsRetentionRepository,
+            flights_repository=Singleton(
+                FlightsSnapshotBackupRepository,
+                flights_repository=Singleton(
+                    FlightsCacheRepository,
+                    repository_uri=config.cache_uri,
+                    cache_key=config.cache_key,
+                    client_side_cache_size=config.cache_client_side_size,
+                ),
+                backup_path=config.snapshot_backup_path,
+            ),
+            retention_window=retention_window,
+        ),
+        in_memory=Singleton(
+            FlightsInMemoryCacheRepository,
+            flights_repository=Factory(
+                FlightsRetentionRepository,
+                flights_repository=Factory(
+                    FlightsSnapshotBackupRepository,
+                    flights_repository=flights_provider,
+                    backup_path=config.snapshot_backup_path,
+                ),
+                retention_window=retention_window,
+            ),
+            ttl=config.in_memory_cache_ttl,
+        ),
+    )
+
+    journeys_repository: Provider[JourneysRepository | None] = Selector(
+        config.journeys_source,
+        materialized=Singleton(
+            JourneysCacheRepository,
+            repository_uri=config.cache_uri,
+            cache_key=config.cache_key,
+        ),
+        none=Object(None),
+    )
+
+    search_journeys_handler = Selector(
+        config.search_mode,
+        inline=Selector(
+            config.handler_lifecycle,
+            singleton=Singleton(
                 SearchJourneysHandler,
                 flights_repository=flights_repository,
-            )
-        }
+                journeys_repository=journeys_repository,
+            ),
+            per_call=Factory(
+                SearchJourneysHandler,
+                flights_repository=flights_repository,
+                journeys_repository=journeys_repository,
+            ),
+        ),
+        process_pool=Singleton(
+            ProcessPoolSearchJourneysHandler,
+            handler_factory=Callable(partial, create_worker_search_handler, config),
+            pool_size=config.search_pool_size,
+            timeout=config.search_timeout,
+        ),
+    )
+
+    search_round_trip_handler = Selector(
+        config.handler_lifecycle,
+        singleton=Singleton(
+            SearchRoundTripHandler,
+            flights_repository=flights_repository,
+            journeys_repository=journeys_repository,
+        ),
+        per_call=Factory(
+            SearchRoundTripHandler,
+            flights_repository=flights_repository,
+            journeys_repository=journeys_repository,
+        ),
+    )
+
+    slow_query_logger = Singleton(
+        create_slow_query_logger,
+        path=config.slow_query_log_path,
+        max_bytes=config.slow_query_log_max_bytes,
+        backup_count=config.slow_query_log_backups,
+    )
+
+    command_bus: Singleton[JourneysCommandBus] = Singleton(
+        JourneysCommandBus,
+        {
+            Factory(SearchJourneys): search_journeys_handler,
+            Factory(SearchRoundTrip): search_round_trip_handler,
+        },
+        middlewares={
+            Factory(SearchJourneys): [
+                Singleton(TimingMiddleware),
+                Singleton(RetentionWindowMiddleware, retention_window=retention_window),
+                Singleton(DeduplicationMiddleware),
+                Singleton(
+                    ResultCacheMiddleware,
+                    flights_repository=flights_repository,
+                    max_size=config.search_result_cache_size,
+                ),
+                Singleton(
+                    SlowQueryLogMiddleware,
+                    flights_repository=flights_repository,
+                    threshold=config.slow_query_threshold,
+                    logger=slow_query_logger,
+                ),
+            ],
+            Factory(SearchRoundTrip): [
+                Singleton(TimingMiddleware),
+                Singleton(RetentionWindowMiddleware, retention_window=retention_window),
+                Singleton(DeduplicationMiddleware),
+                Singleton(
+                    ResultCacheMiddleware,
+                    flights_repository=flights_repository,
+                    max_size=config.search_result_cache_size,
+                ),
+                Singleton(
+                    SlowQueryLogMiddleware,
+                    flights_repository=flights_repository,
+                    threshold=config.slow_query_threshold,
+                    logger=slow_query_logger,
+                ),
+            ],
+        },
+    )
+
+    airport_groups: Singleton[dict[str, frozenset[str]]] = Singleton(
+        parse_airport_groups,
+        config.airport_groups,
+    )
+
+    admission_controller: Singleton[AdmissionController] = Singleton(
+        AdmissionController,
+        max_concurrency=config.search_max_concurrency,
+        max_queue=config.search_max_queue,
+        retry_after=config.search_retry_after,
     )
@@ -1,11 +1,84 @@
-from dataclasses import dataclass
-from datetime import date
+from collections.abc import Iterable
+from dataclasses import dataclass, field, fields
+from datetime import date, timedelta
 
+Airports = str | frozenset[str]  # a single airport code, or a set of them searched together
 
-@dataclass
+
+def _airports(airports: str | Iterable[str]) -> Airports:
+    """Keep single airport sets as plain codes, so the same search is the same action however it was given."""
+    if isinstance(airports, str):
+        return airports
+    airports = frozenset(airports)
+    return next(iter(airports)) if len(airports) == 1 else airports
+
+
+def _airport_set(airports: Airports) -> frozenset[str]:
+    return frozenset((airports,)) if isinstance(airports, str) else airports
+
+
+@dataclass(frozen=True)
 class SearchJourneys:
-    """Action for searching available journeys."""
+    """Action for searching available journeys, from any of the origins to any of the destinations."""
+
+    from_: Airports
+    to: Airports
+    date: date
+    deadline: float | None = field(default=None, compare=False)  # time.monotonic() value to give up searching at
+
+    def __post_init__(self):
+        object.__setattr__(self, 'from_', _airports(self.from_))
+        object.__setattr__(self, 'to', _airports(self.to))
+
+    @property
+    def origins(self) -> frozenset[str]:
+        return _airport_set(self.from_)
+
+    @property
+    def destinations(self) -> frozenset[str]:
+        return _airport_set(self.to)
 
-    from_: str
-    to: str
+
+@dataclass(frozen=True)
+class SearchRoundTrip:
+    """Action for searching outbound and return journeys together, paired as round trips."""
+
+    from_: Airports
+    to: Airports
     date: date
+    min_stay: int  # days from the outbound date to the earliest return date
+    max_stay: int  # days from the outbound date to the latest return date
+    limit: int | None = None  # max round trips returned, all of them if None
+    deadline: float | None = field(default=None, compare=False)  # time.monotonic() value to give up searching at
+
+    def __post_init__(self):
+        object.__setattr__(self, 'from_', _airports(self.from_))
+        object.__setattr__(self, 'to', _airports(self.to))
+
+    def return_dates(self) -> list[date]:
+        return [self.date + timedelta(days=stay) for stay in range(self.min_stay, self.max_stay + 1)]
+
+
+ACTIONS = {action.__name__: action for action in (SearchJourneys, SearchRoundTrip)}
+
+
+def dump_action(action: SearchJourneys | SearchRoundTrip) -> dict:
+    """JSON-serializable form of a search action, leaving its deadline out."""
+    params = {}
+    for action_field in fields(action):
+        if not action_field.compare:
+            continue
+        value = getattr(action, action_field.name)
+        if isinstance(value, frozenset):
+            value = sorted(value)
+        elif isinstance(value, date):
+            value = value.isoformat()
+        params[action_field.name] = value
+    return {'action': type(action).__name__, 'params': params}
+
+
+def load_action(dumped: dict) -> SearchJourneys | SearchRoundTrip:
+    """Build a search action back from dump_action() output."""
+    params = dict(dumped['params'])
+    params['date'] = date.fromisoformat(params['date'])
+    return ACTIONS[dumped['action']](**params)
@@ -0,0 +1,39 @@
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls sharing the same key into a single execution.
+
+    The first caller for a key runs the function, callers arriving while it is still in flight wait for and share
+    its result (or exception). Once it finishes the key is released, so later calls run it again.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as exception:
+            self._release(key)
+            call.set_exception(exception)
+            raise
+        self._release(key)
+        call.set_result(result)
+        return result
+
+    def _release(self, key: Hashable) -> None:
+        with self._lock:
+            del self._calls[key]
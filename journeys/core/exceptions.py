@@ -0,0 +1,23 @@
+class SearchTimeout(Exception):
+    """The search couldn't be completed within its allowed time."""
+
+
+class SearchDeadlineExceeded(SearchTimeout):
+    """The search reached its deadline, `journeys` holds the ones found until then."""
+
+    def __init__(self, action, journeys: list):
+        # Both arguments are kept in args, so the exception can be pickled back from search pool workers.
+        super().__init__(action, journeys)
+        self.journeys = journeys
+
+
+class SearchOutOfRetentionWindow(Exception):
+    """The searched date is outside the span of dates flights are kept for."""
+
+
+class FlightsSnapshotEmpty(Exception):
+    """No flight events were loaded, e.g. the snapshot file or the cache key wasn't written yet."""
+
+
+class FlightsProviderUnavailable(Exception):
+    """The flights provider failed, or isn't being called while its circuit breaker is open."""
@@ -1,62 +1,144 @@
 from dataclasses import dataclass
-from datetime import timedelta
+from time import monotonic
 
-from journeys.core.actions import SearchJourneys
-from journeys.core.models import Journey, FlightEvent, JourneyBuilder
-from journeys.core.repositories import FlightsRepository
+from journeys.core.actions import SearchJourneys, SearchRoundTrip
+from journeys.core.exceptions import SearchDeadlineExceeded
+from journeys.core.indexes import FlightEventsIndex
+from journeys.core.models import Journey, FlightEvent, JourneyBuilder, RoundTrip
+from journeys.core.repositories import FlightsRepository, JourneysRepository
+from journeys.core.stats import SearchStats, current_search_stats
 
 
 @dataclass
 class SearchJourneysHandler:
 
     flights_repository: FlightsRepository
+    journeys_repository: JourneysRepository | None = None
+
+    def __call__(self, action: SearchJourneys, index: FlightEventsIndex | None = None) -> list[Journey]:
+        """
+        Build and return possible journeys from flight events, unless they were already materialized.
+
+        Every origin of the action is searched in the same pass: first legs depart from any of the origins, and land
+        at any of the destinations or connect to a flight that does. Only single origin and destination searches can
+        be materialized.
+
+        If the action has a deadline and it's reached while searching, SearchDeadlineExceeded is raised with the
+        journeys found so far. Callers searching several times can pass the `index` of the snapshot to search in.
+
+        What the search went through is recorded in the current SearchStats, if any.
+        """
+        stats = current_search_stats.get() or SearchStats()
+        if self.journeys_repository is not None and isinstance(action.from_, str) and isinstance(action.to, str):
+            with stats.stage('materialized'):
+                materialized_journeys = self.journeys_repository.get_journeys(action)
+            if materialized_journeys is not None:
+                return materialized_journeys
 
-    def __call__(self, action: SearchJourneys) -> list[Journey]:
-        """Build and return possible journeys from flight events."""
         journeys: list[Journey] = []
-        flight_events = self.flights_repository.get_flight_events()
+        if index is None:
+            index = self.load_index(stats)
+        stats.events = len(index)
         builder = JourneyBuilder()
 
-        for flight_event in flight_events:
-            if flight_event.matches_from_and_time(action.from_, action.date):
-                if flight_event.to == action.to:  # direct fly case
-                    journeys.append(builder.build_direct(flight_event))
-                else:   # search possible connections
-                    for connection in self.__search_connections(action, flight_event, flight_events):
-                        journeys.append(builder.build_with_connection(flight_event, connection))
+        destinations = action.destinations
+        with stats.stage('search'):
+            for origin in sorted(action.origins):
+                for flight_event in index.departing_from(origin):
+                    if action.deadline is not None and monotonic() >= action.deadline:
+                        raise SearchDeadlineExceeded(action, journeys)
+                    if flight_event.matches_from_and_time(origin, action.date):
+                        stats.first_legs += 1
+                        if flight_event.to in destinations:  # direct fly case
+                            journeys.append(builder.build_direct(flight_event))
+                        else:   # search possible connections
+                            stats.connections_evaluated += len(index.departing_from(flight_event.to))
+                            for connection in self.__search_connections(destinations, flight_event, index):
+                                journeys.append(builder.build_with_connection(flight_event, connection))
 
         return journeys
 
+    def load_index(self, stats: SearchStats) -> FlightEventsIndex:
+        """Load the current flights snapshot and get its index, timing both stages."""
+        with stats.stage('load'):
+            flight_events = self.flights_repository.get_flight_events()
+        with stats.stage('index'):
+            return FlightEventsIndex.of(flight_events)
+
     @staticmethod
     def __search_connections(
-            action: SearchJourneys,
+            destinations: frozenset[str],
             initial_flight_event: FlightEvent,
-            flight_events: list[FlightEvent],
+            index: FlightEventsIndex,
     ) -> list[FlightEvent]:
         """
         Search possible connections for a given flight event.
 
-        Given a SearchJourneys action, filter for a given starting flight event, all other flight events that match
-        connection in location and time.
+        Filter for a given starting flight event, all other flight events landing at any of the searched destinations
+        that match connection in location and time.
         Max connections is 1. Waiting time from initial flight event arrival time until connection departure time
         cannot be more than 4 hours. Total flight duration from initial flight event departure time until connection
         arrival time cannot be more than 24 hours.
 
-        :param action: SearchJourneys action, input filter.
+        :param destinations: cities searched journeys can end at.
         :param initial_flight_event: flight event to search all possible connections for.
-        :param flight_events: all the flight events to filter if possible connections for initial_flight_event.
+        :param index: index of all the flight events, to filter possible connections for initial_flight_event among the
+            ones departing from its destination.
         :return: list of flight events that match conditions to be a connection.
         """
         return list(
             filter(
-                lambda connection: (
-                    connection.from_ == initial_flight_event.to and connection.to == action.to
-                    and (
-                        timedelta(hours=0, minutes=0, seconds=0) <=
-                        connection.departure_time - initial_flight_event.arrival_time <= timedelta(hours=4)
-                    )
-                    and connection.arrival_time - initial_flight_event.departure_time <= timedelta(hours=24)
-                ),
-                flight_events
+                lambda connection: connection.to in destinations and initial_flight_event.connects_to(connection),
+                index.departing_from(initial_flight_event.to)
             )
         )
+
+
+@dataclass
+class SearchRoundTripHandler:
+
+    flights_repository: FlightsRepository
+    journeys_repository: JourneysRepository | None = None
+
+    def __call__(self, action: SearchRoundTrip) -> list[RoundTrip]:
+        """
+        Search outbound and return journeys against a single flights snapshot and index, and pair them as round trips.
+
+        Each outbound journey is paired with every return journey departing after it arrived. Round trips are sorted by
+        outbound and then return departure time, and cut to the action limit. If the deadline is reached while
+        searching, SearchDeadlineExceeded is raised with the round trips paired from the journeys found so far.
+        """
+        search_journeys = SearchJourneysHandler(self.flights_repository, self.journeys_repository)
+        index = search_journeys.load_index(current_search_stats.get() or SearchStats())
+        outbound: list[Journey] = []
+        inbound: list[Journey] = []
+        legs = [
+            (outbound, SearchJourneys(from_=action.from_, to=action.to, date=action.date, deadline=action.deadline)),
+            *(
+                (inbound, SearchJourneys(from_=action.to, to=action.from_, date=date_, deadline=action.deadline))
+                for date_ in action.return_dates()
+            ),
+        ]
+        for journeys, leg in legs:
+            try:
+                journeys += search_journeys(leg, index)
+            except SearchDeadlineExceeded as deadline_exceeded:
+                journeys += deadline_exceeded.journeys
+                raise SearchDeadlineExceeded(action, self.__pair(action, outbound, inbound)) from deadline_exceeded
+        return self.__pair(action, outbound, inbound)
+
+    @staticmethod
+    def __pair(action: SearchRoundTrip, outbound: list[Journey], inbound: list[Journey]) -> list[RoundTrip]:
+        round_trips = sorted(
+            (
+                RoundTrip(outbound=outbound_journey, inbound=inbound_journey)
+                for outbound_journey in outbound
+                for inbound_journey in inbound
+                if inbound_journey.flight_events[0].departure_time >= outbound_journey.flight_events[-1].arrival_time
+            ),
+            key=lambda round_trip: (
+                round_trip.outbound.flight_events[0].departure_time,
+                round_trip.inbound.flight_events[0].departure_time,
+            ),
+        )
+        return round_trips[:action.limit]
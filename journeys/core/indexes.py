@@ -0,0 +1,74 @@
+from array import array
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+
+from journeys.core.models import FlightEvent
+
+
+class _Departures(Sequence):
+    """Flight events of a snapshot at the given positions, decoded on access."""
+
+    def __init__(self, flight_events: Sequence[FlightEvent], positions: array):
+        self._flight_events = flight_events
+        self._positions = positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._flight_events[position] for position in self._positions[index]]
+        return self._flight_events[self._positions[index]]
+
+    def __iter__(self) -> Iterator[FlightEvent]:
+        for position in self._positions:
+            yield self._flight_events[position]
+
+
+class FlightEventsIndex:
+    """
+    Flight events of a snapshot grouped by departure city, keeping the snapshot order within each city.
+
+    Building it is a single pass over the snapshot. The index of the last snapshot seen is kept, so repositories
+    returning the same snapshot object until it changes (in-memory cache, memory-mapped file) build it only once.
+
+    Snapshots that aren't lists (e.g. memory-mapped files, decoding flight events on access) are indexed by position
+    instead, so the index doesn't keep a decoded copy of them in every process.
+    """
+
+    _last: tuple[Sequence[FlightEvent], 'FlightEventsIndex'] | None = None
+
+    def __init__(self, flight_events: Sequence[FlightEvent]):
+        self._size = 0
+        if isinstance(flight_events, list):
+            self._flight_events = None
+            self._departures: dict[str, list[FlightEvent] | array] = defaultdict(list)
+            for flight_event in flight_events:
+                self._departures[flight_event.from_].append(flight_event)
+                self._size += 1
+        else:
+            self._flight_events = flight_events
+            self._departures = defaultdict(lambda: array('I'))
+            for position, flight_event in enumerate(flight_events):
+                self._departures[flight_event.from_].append(position)
+                self._size += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def of(cls, flight_events: Sequence[FlightEvent]) -> 'FlightEventsIndex':
+        last = cls._last
+        if last is not None and last[0] is flight_events:
+            return last[1]
+        index = cls(flight_events)
+        cls._last = (flight_events, index)
+        return index
+
+    def departing_from(self, city: str) -> Sequence[FlightEvent]:
+        departures = self._departures.get(city)
+        if departures is None:
+            return []
+        if self._flight_events is None:
+            return departures
+        return _Departures(self._flight_events, departures)
@@ -0,0 +1,39 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+
+from journeys.core.indexes import FlightEventsIndex
+from journeys.core.models import FlightEvent, Journey, JourneyBuilder
+
+JourneyKey = tuple[str, str, date]
+MaterializedJourneys = dict[JourneyKey, list[Journey]]
+
+
+@dataclass
+class JourneysMaterializer:
+    """
+    Precompute every journey SearchJourneysHandler could return, for all (origin, destination, date) combinations.
+
+    Follows the same rules as the handler: direct flights, or one connection when the first flight doesn't already
+    land at the destination. Journeys are listed in the same order the handler would build them.
+    """
+
+    def __call__(self, flight_events: list[FlightEvent]) -> MaterializedJourneys:
+        journeys: dict[JourneyKey, list[Journey]] = defaultdict(list)
+        index = FlightEventsIndex.of(flight_events)
+        builder = JourneyBuilder()
+
+        for flight_event in flight_events:
+            departure_date = flight_event.departure_time.date()
+            if not flight_event.matches_from_and_time(flight_event.from_, departure_date):
+                continue
+            journeys[(flight_event.from_, flight_event.to, departure_date)].append(
+                builder.build_direct(flight_event)
+            )
+            for connection in index.departing_from(flight_event.to):
+                if connection.to != flight_event.to and flight_event.connects_to(connection):
+                    journeys[(flight_event.from_, connection.to, departure_date)].append(
+                        builder.build_with_connection(flight_event, connection)
+                    )
+
+        return dict(journeys)
@@ -0,0 +1,162 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable
+
+from journeys.core.actions import SearchRoundTrip, dump_action
+from journeys.core.concurrency import SingleFlight
+from journeys.core.exceptions import SearchDeadlineExceeded, SearchOutOfRetentionWindow
+from journeys.core.models import RetentionWindow
+from journeys.core.repositories import FlightsRepository
+from journeys.core.stats import SearchStats, current_search_stats
+
+LOGGER = logging.getLogger(__name__)
+
+NextHandler = Callable[[Any], Any]
+
+
+class CommandMiddleware(ABC):
+    """
+    Abstract base class for a command bus middleware.
+
+    Middlewares wrap the handler of an action type: they receive the action and
+    the next step of the pipeline, and decide whether and how to call it.
+    """
+
+    @abstractmethod
+    def __call__(self, action: Any, next_: NextHandler) -> Any:
+        pass
+
+
+class TimingMiddleware(CommandMiddleware):
+    """Log how long each action took to be handled."""
+
+    def __call__(self, action: Any, next_: NextHandler) -> Any:
+        started_at = perf_counter()
+        try:
+            return next_(action)
+        finally:
+            LOGGER.debug("%s handled in %.2fms.", action, (perf_counter() - started_at) * 1000)
+
+
+class DeduplicationMiddleware(CommandMiddleware):
+    """Identical actions handled concurrently share a single execution and its result. Actions must be hashable."""
+
+    def __init__(self):
+        self._single_flight = SingleFlight()
+
+    def __call__(self, action: Any, next_: NextHandler) -> Any:
+        return self._single_flight.do(action, lambda: next_(action))
+
+
+class ResultCacheMiddleware(CommandMiddleware):
+    """
+    Keep the results of the last `max_size` actions for the current flights snapshot version.
+
+    Nothing is cached when the repository doesn't know its snapshot version, or when `max_size` is 0.
+    """
+
+    def __init__(self, flights_repository: FlightsRepository, max_size: int):
+        self._flights_repository = flights_repository
+        self._max_size = max_size
+        self._lock = Lock()
+        self._results: OrderedDict[tuple[str, Any], Any] = OrderedDict()
+
+    def __call__(self, action: Any, next_: NextHandler) -> Any:
+        snapshot_version = self._flights_repository.get_snapshot_version() if self._max_size else None
+        if snapshot_version is None:
+            return next_(action)
+
+        key = (snapshot_version, action)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        result = next_(action)
+        with self._lock:
+            self._results[key] = result
+            if len(self._results) > self._max_size:
+                self._results.popitem(last=False)
+        return result
+
+
+class RetentionWindowMiddleware(CommandMiddleware):
+    """
+    Reject searches for dates whose flights aren't kept, instead of scanning for journeys that can't exist.
+
+    Every return date of a round trip must be kept too.
+    """
+
+    def __init__(self, retention_window: RetentionWindow | None):
+        self._retention_window = retention_window
+
+    def __call__(self, action: Any, next_: NextHandler) -> Any:
+        if self._retention_window is None:
+            return next_(action)
+        dates = [action.date, *action.return_dates()] if isinstance(action, SearchRoundTrip) else [action.date]
+        if not all(self._retention_window.contains(date_) for date_ in dates):
+            raise SearchOutOfRetentionWindow(action)
+        return next_(action)
+
+
+class SlowQueryLogMiddleware(CommandMiddleware):
+    """
+    Log searches taking `threshold` milliseconds or more to `logger`, as one JSON object per line.
+
+    Entries hold the action as dump_action() outputs it, so journeys.tools.replay can run it again, the flights
+    snapshot version, the SearchStats of the search (flight events scanned, first legs, connections evaluated and
+    milliseconds per stage), the total milliseconds, and the number of results or the error raised. Stats are only
+    recorded for searches handled in this process, not in a search pool. Nothing is logged when `threshold` is 0.
+    """
+
+    def __init__(self, flights_repository: FlightsRepository, threshold: float, logger: logging.Logger):
+        self._flights_repository = flights_repository
+        self._threshold = threshold
+        self._logger = logger
+
+    def __call__(self, action: Any, next_: NextHandler) -> Any:
+        if not self._threshold:
+            return next_(action)
+
+        stats = SearchStats()
+        token = current_search_stats.set(stats)
+        started_at = perf_counter()
+        results, error = None, None
+        try:
+            results = next_(action)
+            return results
+        except SearchDeadlineExceeded as deadline_exceeded:
+            results, error = deadline_exceeded.journeys, deadline_exceeded
+            raise
+        except Exception as exception:
+            error = exception
+            raise
+        finally:
+            current_search_stats.reset(token)
+            total = (perf_counter() - started_at) * 1000
+            if total >= self._threshold:
+                self._log(action, stats, total, results, error)
+
+    def _log(self, action: Any, stats: SearchStats, total: float, results: list | None, error: Exception | None):
+        try:
+            snapshot_version = self._flights_repository.get_snapshot_version()
+        except Exception:
+            snapshot_version = None
+        self._logger.info(json.dumps({
+            'logged_at': datetime.now(timezone.utc).isoformat(),
+            **dump_action(action),
+            'snapshot_version': snapshot_version,
+            'events': stats.events,
+            'first_legs': stats.first_legs,
+            'connections_evaluated': stats.connections_evaluated,
+            'results': None if results is None else len(results),
+            'error': None if error is None else type(error).__name__,
+            'timings_ms': {
+                **{stage: round(elapsed, 3) for stage, elapsed in stats.timings.items()},
+                'total': round(total, 3),
+            },
+        }))
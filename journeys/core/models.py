@@ -1,6 +1,7 @@
 from copy import deepcopy
 from dataclasses import dataclass, field
-from datetime import date, datetime, timedelta
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta, timezone
 
 
 @dataclass
@@ -24,6 +25,55 @@ class FlightEvent:
             and self.arrival_time - self.departure_time <= timedelta(hours=24)
         )
 
+    def connects_to(self, connection: 'FlightEvent') -> bool:
+        """
+        Return true if connection departs from this flight's destination and can be taken after it.
+
+        Waiting time from this flight's arrival until connection departure cannot be more than 4 hours. Total duration
+        from this flight's departure until connection arrival cannot be more than 24 hours.
+        """
+        return (
+            connection.from_ == self.to
+            and (
+                timedelta(hours=0, minutes=0, seconds=0) <=
+                connection.departure_time - self.arrival_time <= timedelta(hours=4)
+            )
+            and connection.arrival_time - self.departure_time <= timedelta(hours=24)
+        )
+
+
+@dataclass(frozen=True)
+class RetentionWindow:
+    """
+    Departure dates flights are kept and searched for, relative to the current UTC date.
+
+    Searches are accepted from `past_days` ago until `future_days` ahead. Flights departing one more day ahead are
+    kept too, as they can still be the connection of a journey departing on the last searchable date.
+    """
+
+    past_days: int
+    future_days: int
+
+    def bounds(self) -> tuple[date, date]:
+        today = datetime.now(timezone.utc).date()
+        return today - timedelta(days=self.past_days), today + timedelta(days=self.future_days)
+
+    def contains(self, date_: date) -> bool:
+        first_date, last_date = self.bounds()
+        return first_date <= date_ <= last_date
+
+    def prune(self, flight_events: Iterable[FlightEvent]) -> list[FlightEvent]:
+        return prune_flight_events(flight_events, *self.bounds())
+
+
+def prune_flight_events(flight_events: Iterable[FlightEvent], first_date: date, last_date: date) -> list[FlightEvent]:
+    """Keep flights departing within the retention window bounds, or on the day after them (see RetentionWindow)."""
+    last_date += timedelta(days=1)
+    return [
+        flight_event for flight_event in flight_events
+        if first_date <= flight_event.departure_time.date() <= last_date
+    ]
+
 
 @dataclass
 class Journey:
@@ -38,6 +88,14 @@ class Journey:
         return len(self.flight_events) - 1
 
 
+@dataclass
+class RoundTrip:
+    """An outbound journey and a return journey departing after it arrived."""
+
+    outbound: Journey
+    inbound: Journey
+
+
 class JourneyBuilder:
     """Responsible for creating Journey objects from flight events."""
 
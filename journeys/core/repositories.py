@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 
-from journeys.core.models import FlightEvent
+from journeys.core.actions import SearchJourneys
+from journeys.core.models import FlightEvent, Journey
 
 
 class FlightsRepository(ABC):
@@ -14,3 +15,24 @@ class FlightsRepository(ABC):
     @abstractmethod
     def get_flight_events(self) -> list[FlightEvent]:
         pass
+
+    def get_snapshot_version(self) -> str | None:
+        """Return an identifier that changes whenever the flight events change, or None if unknown."""
+        return None
+
+    def get_snapshot_age(self) -> float | None:
+        """Return how many seconds ago the flight events were fetched from their source, or None if unknown."""
+        return None
+
+
+class JourneysRepository(ABC):
+    """
+    Abstract base class for a repository of precomputed journeys.
+
+    Implementations return the journeys materialized for a search, or None when
+    they weren't, so the caller can compute them from flight events instead.
+    """
+
+    @abstractmethod
+    def get_journeys(self, action: SearchJourneys) -> list[Journey] | None:
+        pass
@@ -0,0 +1,30 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+
+
+@dataclass
+class SearchStats:
+    """
+    What a search went through: flight events scanned, first legs and connections evaluated, and time per stage.
+
+    Counters and stage timings add up when several searches run under the same stats, like the legs of a round trip.
+    """
+
+    events: int = 0
+    first_legs: int = 0
+    connections_evaluated: int = 0
+    timings: dict[str, float] = field(default_factory=dict)  # milliseconds per stage
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started_at = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + (perf_counter() - started_at) * 1000
+
+
+current_search_stats: ContextVar[SearchStats | None] = ContextVar('current_search_stats', default=None)
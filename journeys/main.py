@@ -1,17 +1,115 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
 
 from journeys.app import views
 from journeys.containers import JourneysContainer
+from journeys.core.exceptions import FlightsSnapshotEmpty
+from journeys.core.indexes import FlightEventsIndex
+
+LOGGER = logging.getLogger(__name__)
+PRELOAD_RETRY_EVERY = 5
+
+
+def preload(container: JourneysContainer) -> None:
+    """Open connections, load the flights snapshot and build its index before serving searches."""
+    if container.config.search_mode() == 'process_pool':
+        # Searches run in the pool workers, each one loading and indexing its own snapshot: the API process doesn't
+        # keep another copy, it only checks a worker loaded it.
+        flight_events_count = container.search_journeys_handler().count_flight_events()
+    else:
+        flights_repository = container.flights_repository()
+        FlightEventsIndex.of(flights_repository.get_flight_events())
+        # After a restart the first call only serves the local backup, the second one loads the source snapshot as
+        # well (the backup again if it's unavailable), so the first search doesn't pay for it.
+        flight_events = flights_repository.get_flight_events()
+        FlightEventsIndex.of(flight_events)
+        flight_events_count = len(flight_events)
+    if not flight_events_count:
+        # Not ready to answer searches from an empty timetable, preload is retried until a snapshot is written.
+        raise FlightsSnapshotEmpty()
+    container.journeys_repository()
+    container.search_journeys_handler()
+    container.command_bus()
+
+
+async def preload_until_ready(app: FastAPI) -> None:
+    while True:
+        try:
+            await run_in_threadpool(preload, app.container)
+        except Exception:
+            LOGGER.exception("Could not preload flights snapshot, retrying in %s seconds.", PRELOAD_RETRY_EVERY)
+            await asyncio.sleep(PRELOAD_RETRY_EVERY)
+        else:
+            app.state.ready = True
+            return
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    preloading = asyncio.create_task(preload_until_ready(app))
+    yield
+    preloading.cancel()
+    if app.container.config.search_mode() == 'process_pool':
+        app.container.search_journeys_handler().shutdown()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
     app.include_router(views.router)
+    app.include_router(views.health_router)
     container = JourneysContainer()
     container.config.flights_provider_base_url.from_env('FLIGHTS_PROVIDER_BASE_URL')
     container.config.flights_provider_endpoint_v1.from_env('FLIGHTS_PROVIDER_ENDPOINT_V1')
+    container.config.provider_connect_timeout.from_env('PROVIDER_CONNECT_TIMEOUT', as_=float, default=3.05)
+    container.config.provider_read_timeout.from_env('PROVIDER_READ_TIMEOUT', as_=float, default=10)
+    container.config.provider_hedge_after.from_env('PROVIDER_HEDGE_AFTER', as_=float, default=0)
+    container.config.provider_failure_threshold.from_env('PROVIDER_FAILURE_THRESHOLD', as_=int, default=5)
+    container.config.provider_reset_timeout.from_env('PROVIDER_RESET_TIMEOUT', as_=float, default=30)
     container.config.cache_uri.from_env('CACHE_URI')
     container.config.cache_key.from_env('CACHE_KEY')
+    container.config.cache_client_side_size.from_env('CACHE_CLIENT_SIDE_SIZE', as_=int, default=0)
+    container.config.cache_refresh_every.from_env('CACHE_REFRESH_EVERY', as_=int, default=0)
+    container.config.snapshot_path.from_env('SNAPSHOT_PATH', default='')
+    container.config.snapshot_backup_path.from_env('SNAPSHOT_BACKUP_PATH', default='')
+    container.config.materialize_journeys.from_env('MATERIALIZE_JOURNEYS', as_=int, default=0)
+    container.config.in_memory_cache_ttl.from_env('IN_MEMORY_CACHE_TTL', as_=float, default=60)
+    container.config.search_pool_size.from_env('SEARCH_POOL_SIZE', as_=int, default=0)
+    container.config.search_timeout.from_env('SEARCH_TIMEOUT', as_=float, default=10)
+    container.config.search_deadline.from_env('SEARCH_DEADLINE', as_=float, default=0)
+    container.config.search_max_concurrency.from_env('SEARCH_MAX_CONCURRENCY', as_=int, default=0)
+    container.config.search_max_queue.from_env('SEARCH_MAX_QUEUE', as_=int, default=0)
+    container.config.search_retry_after.from_env('SEARCH_RETRY_AFTER', as_=int, default=1)
+    container.config.search_result_cache_size.from_env('SEARCH_RESULT_CACHE_SIZE', as_=int, default=0)
+    container.config.handler_lifecycle.from_env('HANDLER_LIFECYCLE', default='singleton')
+    container.config.retention_past_days.from_env('RETENTION_PAST_DAYS', as_=int, default=1)
+    container.config.retention_future_days.from_env('RETENTION_FUTURE_DAYS', as_=int, default=0)
+    container.config.slow_query_threshold.from_env('SLOW_QUERY_THRESHOLD', as_=float, default=0)
+    container.config.slow_query_log_path.from_env('SLOW_QUERY_LOG_PATH', default='')
+    container.config.slow_query_log_max_bytes.from_env('SLOW_QUERY_LOG_MAX_BYTES', as_=int, default=10_000_000)
+    container.config.slow_query_log_backups.from_env('SLOW_QUERY_LOG_BACKUPS', as_=int, default=5)
+    container.config.airport_groups.from_env('AIRPORT_GROUPS', default='')
+    container.config.response_gzip_min_size.from_env('RESPONSE_GZIP_MIN_SIZE', as_=int, default=0)
+
+    use_cache = bool(container.config.cache_refresh_every())
+    container.config.flights_source.from_value(
+        ('snapshot_file' if container.config.snapshot_path() else 'cache') if use_cache else 'in_memory'
+    )
+    container.config.journeys_source.from_value(
+        'materialized' if use_cache and container.config.materialize_journeys() else 'none'
+    )
+    container.config.retention.from_value('enabled' if container.config.retention_future_days() else 'disabled')
+    container.config.search_mode.from_value('process_pool' if container.config.search_pool_size() else 'inline')
+    container.config.cache_max_age.from_value(
+        container.config.cache_refresh_every() or int(container.config.in_memory_cache_ttl())
+    )
+    if container.config.response_gzip_min_size():
+        app.add_middleware(GZipMiddleware, minimum_size=container.config.response_gzip_min_size())
     app.container = container
     return app
 
@@ -0,0 +1,101 @@
+"""
+Replay slow query log entries against a saved binary flights snapshot.
+
+Usage: python -m journeys.tools.replay SLOW_QUERY_LOG SNAPSHOT
+
+Every entry is searched again, without deadline, and printed as a JSON line next to the figures logged for it. Use the
+snapshot the entry was logged for (see `snapshot_version`) to reproduce it, e.g. a copy of SNAPSHOT_PATH or
+SNAPSHOT_BACKUP_PATH taken at the time. With a retention window the logged version is `hash:first_date:last_date`, the
+hash names the snapshot file and the entry is searched again on its flights pruned to those dates.
+"""
+import argparse
+import json
+from collections.abc import Iterator, Sequence
+from datetime import date
+from time import perf_counter
+
+from journeys.app.repositories import FlightsSnapshotFileRepository
+from journeys.core.actions import SearchJourneys, SearchRoundTrip, load_action
+from journeys.core.handlers import SearchJourneysHandler, SearchRoundTripHandler
+from journeys.core.models import FlightEvent, prune_flight_events
+from journeys.core.repositories import FlightsRepository
+from journeys.core.stats import SearchStats, current_search_stats
+
+HANDLERS = {
+    SearchJourneys: SearchJourneysHandler,
+    SearchRoundTrip: SearchRoundTripHandler,
+}
+
+
+class PrunedFlightsRepository(FlightsRepository):
+    """Serve the flights of a snapshot file departing within the retention window bounds an entry was logged with."""
+
+    def __init__(self, flight_events: Sequence[FlightEvent], first_date: date, last_date: date):
+        self._flight_events = prune_flight_events(flight_events, first_date, last_date)
+
+    def get_flight_events(self) -> list[FlightEvent]:
+        return self._flight_events
+
+
+def replay(log_path: str, snapshot_path: str) -> Iterator[dict]:
+    """Search every entry of a slow query log again against a snapshot file, yielding logged and replayed figures."""
+    snapshot_repository = FlightsSnapshotFileRepository(snapshot_path=snapshot_path)
+    snapshot_version = snapshot_repository.get_snapshot_version()
+    pruned_repositories: dict[tuple[str, str], FlightsRepository] = {}
+    with open(log_path, encoding='utf-8') as log:
+        for line in filter(str.strip, log):
+            entry = json.loads(line)
+            action = load_action(entry)
+            logged_version, *bounds = (entry['snapshot_version'] or '').split(':')
+            flights_repository = snapshot_repository
+            if len(bounds) == 2:
+                first_date, last_date = bounds
+                if (first_date, last_date) not in pruned_repositories:
+                    pruned_repositories[first_date, last_date] = PrunedFlightsRepository(
+                        snapshot_repository.get_flight_events(),
+                        date.fromisoformat(first_date),
+                        date.fromisoformat(last_date),
+                    )
+                flights_repository = pruned_repositories[first_date, last_date]
+            handler = HANDLERS[type(action)](flights_repository=flights_repository)
+
+            stats = SearchStats()
+            token = current_search_stats.set(stats)
+            started_at = perf_counter()
+            try:
+                results = handler(action)
+            finally:
+                current_search_stats.reset(token)
+            total = (perf_counter() - started_at) * 1000
+
+            yield {
+                'action': entry['action'],
+                'params': entry['params'],
+                'same_snapshot': logged_version == snapshot_version,
+                'logged': {
+                    'results': entry['results'],
+                    'connections_evaluated': entry['connections_evaluated'],
+                    'timings_ms': entry['timings_ms'],
+                },
+                'replayed': {
+                    'results': len(results),
+                    'connections_evaluated': stats.connections_evaluated,
+                    'timings_ms': {
+                        **{stage: round(elapsed, 3) for stage, elapsed in stats.timings.items()},
+                        'total': round(total, 3),
+                    },
+                },
+            }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Replay slow query log entries against a saved flights snapshot.')
+    parser.add_argument('log_path', help='slow query log, as written to SLOW_QUERY_LOG_PATH')
+    parser.add_argument('snapshot_path', help='binary flights snapshot, as written to SNAPSHOT_PATH')
+    arguments = parser.parse_args()
+    for replayed in replay(arguments.log_path, arguments.snapshot_path):
+        print(json.dumps(replayed))
+
+
+if __name__ == '__main__':
+    main()
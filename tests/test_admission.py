@@ -0,0 +1,49 @@
+import asyncio
+from time import monotonic
+
+import pytest
+
+from journeys.app.admission import AdmissionController, Overloaded
+
+
+class TestAdmissionController:
+    """Test bounding of concurrent and queued searches."""
+
+    def test_full_queue_is_rejected(self):
+        async def scenario():
+            admission_controller = AdmissionController(max_concurrency=1, max_queue=1, retry_after=3)
+            release = asyncio.Event()
+
+            async def search():
+                async with admission_controller.admit():
+                    await release.wait()
+
+            running = asyncio.create_task(search())
+            queued = asyncio.create_task(search())
+            await asyncio.sleep(0)
+            with pytest.raises(Overloaded) as overloaded:
+                async with admission_controller.admit():
+                    pass
+            release.set()
+            await asyncio.gather(running, queued)
+            return overloaded.value.retry_after
+
+        assert asyncio.run(scenario()) == 3
+
+    def test_deadline_reached_while_queued_is_rejected(self):
+        async def scenario():
+            admission_controller = AdmissionController(max_concurrency=1, max_queue=1, retry_after=1)
+            async with admission_controller.admit():
+                with pytest.raises(Overloaded):
+                    async with admission_controller.admit(deadline=monotonic() + 0.01):
+                        pass
+
+        asyncio.run(scenario())
+
+    def test_disabled_admits_everything(self):
+        async def scenario():
+            admission_controller = AdmissionController(max_concurrency=0, max_queue=0, retry_after=1)
+            async with admission_controller.admit(), admission_controller.admit():
+                return True
+
+        assert asyncio.run(scenario())
@@ -1,16 +1,32 @@
 from datetime import datetime, date
 from http import HTTPStatus
-from unittest.mock import patch
+from time import sleep
+from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
+from journeys.app.repositories import FlightsSnapshotBackupRepository
+from journeys.app.snapshots import write_snapshot
 from journeys.containers import JourneysCommandBus
-from journeys.core.models import Journey, FlightEvent
-from journeys.main import app
+from journeys.core.exceptions import FlightsSnapshotEmpty, SearchDeadlineExceeded
+from journeys.core.actions import SearchJourneys, SearchRoundTrip
+from journeys.core.models import Journey, FlightEvent, RoundTrip
+from journeys.app.models import parse_airport_groups
+from journeys.main import app, preload
 
 client = TestClient(app)
 
+FLIGHT_EVENTS = [
+    FlightEvent(
+        flight_number='XX1234',
+        from_='BUE',
+        to='SAO',
+        departure_time=datetime(2025, 7, 1, 13),
+        arrival_time=datetime(2025, 7, 1, 17),
+    ),
+]
+
 
 class TestSearchJourneysApp:
     """Test endpoint behavior."""
@@ -137,3 +153,265 @@ class TestSearchJourneysApp:
         )
 
         assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    @patch.object(JourneysCommandBus, 'handle')
+    def test_search_journeys_responses_etag(self, mock_handle):
+        mock_handle.return_value = []
+        flights_repository = MagicMock()
+        flights_repository.get_snapshot_version.return_value = 'SNAPSHOT_VERSION'
+
+        with app.container.flights_repository.override(flights_repository):
+            response = client.get(
+                '/journeys/search',
+                params={
+                    'date': date(2025, 7, 1),
+                    'origin': 'BUE',
+                    'destination': 'SAO',
+                }
+            )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers['ETag'].startswith('W/"')
+        assert response.headers['Cache-Control'].startswith('public, max-age=')
+
+    @patch.object(JourneysCommandBus, 'handle')
+    def test_search_journeys_responses_not_modified(self, mock_handle):
+        flights_repository = MagicMock()
+        flights_repository.get_snapshot_version.return_value = 'SNAPSHOT_VERSION'
+        params = {
+            'date': date(2025, 7, 1),
+            'origin': 'BUE',
+            'destination': 'SAO',
+        }
+
+        with app.container.flights_repository.override(flights_repository):
+            mock_handle.return_value = []
+            etag = client.get('/journeys/search', params=params).headers['ETag']
+            mock_handle.reset_mock()
+            response = client.get('/journeys/search', params=params, headers={'If-None-Match': etag})
+            flights_repository.get_snapshot_version.return_value = 'NEW_SNAPSHOT_VERSION'
+            changed_response = client.get('/journeys/search', params=params, headers={'If-None-Match': etag})
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.headers['ETag'] == etag
+        assert changed_response.status_code == HTTPStatus.OK
+        mock_handle.assert_called_once()
+
+    @patch.object(JourneysCommandBus, 'handle')
+    def test_search_journeys_responses_partial_results(self, mock_handle):
+        mock_handle.side_effect = SearchDeadlineExceeded(None, [Journey(flight_events=[])])
+
+        response = client.get(
+            '/journeys/search',
+            params={
+                'date': date(2025, 7, 1),
+                'origin': 'BUE',
+                'destination': 'SAO',
+            }
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers['X-Partial-Results'] == 'true'
+        assert response.json() == [{'connections': 0, 'path': []}]
+
+    @patch.object(JourneysCommandBus, 'handle')
+    def test_search_journeys_responses_gateway_timeout(self, mock_handle):
+        mock_handle.side_effect = SearchDeadlineExceeded(None, [])
+
+        response = client.get(
+            '/journeys/search',
+            params={
+                'date': date(2025, 7, 1),
+                'origin': 'BUE',
+                'destination': 'SAO',
+            }
+        )
+
+        assert response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+
+    @patch.object(JourneysCommandBus, 'handle')
+    def test_search_journeys_airport_sets_and_groups(self, mock_handle):
+        """Comma separated codes and airport group names are searched together."""
+        mock_handle.return_value = []
+
+        with app.container.airport_groups.override({'BUE': frozenset({'EZE', 'AEP'})}):
+            response = client.get(
+                '/journeys/search',
+                params={
+                    'date': date(2025, 7, 1),
+                    'origin': 'BUE',
+                    'destination': 'SAO,RIO',
+                }
+            )
+
+        assert response.status_code == HTTPStatus.OK
+        mock_handle.assert_called_once_with(SearchJourneys(
+            from_=frozenset({'EZE', 'AEP'}), to=frozenset({'SAO', 'RIO'}), date=date(2025, 7, 1),
+        ))
+
+    @patch.object(JourneysCommandBus, 'handle')
+    def test_search_journeys_responses_unprocessable_airport(self, mock_handle):
+        response = client.get(
+            '/journeys/search',
+            params={
+                'date': date(2025, 7, 1),
+                'origin': 'BUE,BUENOS',
+                'destination': 'SAO',
+            }
+        )
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        mock_handle.assert_not_called()
+
+
+class TestSearchRoundTripApp:
+    """Test the round trip search endpoint."""
+
+    @patch.object(JourneysCommandBus, 'handle')
+    def test_search_round_trip_responses_round_trips(self, mock_handle):
+        mock_handle.return_value = [
+            RoundTrip(
+                outbound=Journey(flight_events=[FlightEvent(
+                    flight_number='XX1234',
+                    from_='BUE',
+                    to='SAO',
+                    departure_time=datetime(2025, 7, 1, 13),
+                    arrival_time=datetime(2025, 7, 1, 17),
+                )]),
+                inbound=Journey(flight_events=[FlightEvent(
+                    flight_number='XX5678',
+                    from_='SAO',
+                    to='BUE',
+                    departure_time=datetime(2025, 7, 8, 13),
+                    arrival_time=datetime(2025, 7, 8, 17),
+                )]),
+            ),
+        ]
+
+        response = client.get(
+            '/journeys/round-trip',
+            params={
+                'date': date(2025, 7, 1),
+                'origin': 'BUE',
+                'destination': 'SAO',
+                'return_date': date(2025, 7, 8),
+                'limit': 10,
+            }
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert [
+            (round_trip['outbound']['path'][0]['from'], round_trip['inbound']['path'][0]['from'])
+            for round_trip in response.json()
+        ] == [('BUE', 'SAO')]
+        mock_handle.assert_called_once_with(SearchRoundTrip(
+            from_='BUE', to='SAO', date=date(2025, 7, 1), min_stay=7, max_stay=7, limit=10,
+        ))
+
+    @pytest.mark.parametrize('params', [
+        {},
+        {'return_date': date(2025, 6, 30)},
+        {'return_date': date(2025, 7, 8), 'min_stay': 1, 'max_stay': 3},
+        {'min_stay': 3, 'max_stay': 1},
+        {'min_stay': 1, 'max_stay': 60},
+    ])
+    @patch.object(JourneysCommandBus, 'handle')
+    def test_search_round_trip_responses_unprocessable_return(self, mock_handle, params):
+        response = client.get(
+            '/journeys/round-trip',
+            params={'date': date(2025, 7, 1), 'origin': 'BUE', 'destination': 'SAO', **params},
+        )
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        mock_handle.assert_not_called()
+
+
+class TestAirportGroups:
+    """Test parsing airport groups from AIRPORT_GROUPS."""
+
+    def test_parse_airport_groups(self):
+        assert parse_airport_groups(' BUE=EZE,AEP; LON=LHR, LGW ,STN;') == {
+            'BUE': frozenset({'EZE', 'AEP'}),
+            'LON': frozenset({'LHR', 'LGW', 'STN'}),
+        }
+        assert parse_airport_groups('') == {}
+
+
+class TestReadinessApp:
+    """Test readiness gating on the snapshot preload."""
+
+    def test_ready_once_snapshot_is_preloaded(self):
+        flights_repository = MagicMock()
+        flights_repository.get_flight_events.return_value = FLIGHT_EVENTS
+        flights_repository.get_snapshot_age.return_value = 5.0
+
+        with app.container.flights_repository.override(flights_repository), TestClient(app) as ready_client:
+            for _ in range(100):
+                response = ready_client.get('/ready')
+                if response.status_code == HTTPStatus.OK:
+                    break
+                sleep(0.01)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {'ready': True, 'snapshot_age': 5.0}
+
+    def test_source_snapshot_is_preloaded_after_backup(self, tmp_path):
+        """Restarting with a local backup serves it first, the source is still loaded before the first search."""
+        backup_path = str(tmp_path / 'backup.bin')
+        write_snapshot(backup_path, FLIGHT_EVENTS)
+        source_repository = MagicMock()
+        source_repository.get_flight_events.return_value = FLIGHT_EVENTS
+        source_repository.get_snapshot_version.return_value = None
+        flights_repository = FlightsSnapshotBackupRepository(
+            flights_repository=source_repository,
+            backup_path=backup_path,
+        )
+
+        with app.container.flights_repository.override(flights_repository):
+            preload(app.container)
+
+        source_repository.get_flight_events.assert_called_once()
+
+    def test_process_pool_snapshot_is_only_loaded_by_workers(self):
+        """Searches run in the pool workers, the API process doesn't load another copy of the snapshot."""
+        flights_repository = MagicMock()
+        search_journeys_handler = MagicMock()
+        search_journeys_handler.count_flight_events.return_value = 1
+
+        with (
+            app.container.config.search_mode.override('process_pool'),
+            app.container.flights_repository.override(flights_repository),
+            app.container.search_journeys_handler.override(search_journeys_handler),
+        ):
+            preload(app.container)
+
+        flights_repository.get_flight_events.assert_not_called()
+        search_journeys_handler.count_flight_events.assert_called_once()
+
+    def test_empty_snapshot_is_not_preloaded(self):
+        """The snapshot file or cache key isn't written yet, searches would all answer an empty timetable."""
+        flights_repository = MagicMock()
+        flights_repository.get_flight_events.return_value = []
+
+        with app.container.flights_repository.override(flights_repository), pytest.raises(FlightsSnapshotEmpty):
+            preload(app.container)
+
+    def test_not_ready_while_preloading(self):
+        app.state.ready = False
+
+        response = client.get('/ready')
+
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert response.json() == {'ready': False, 'snapshot_age': None}
+
+
+class TestMetricsApp:
+    """Test the flights provider metrics endpoint."""
+
+    def test_metrics_report_flights_provider(self):
+        response = client.get('/metrics')
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'flights_provider': {'circuit_breaker': 'closed', 'hedges_fired': 0, 'hedges_won': 0},
+        }
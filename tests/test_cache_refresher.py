@@ -0,0 +1,157 @@
+from datetime import date, datetime
+from time import sleep
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from cache_refresher.cache import RedisCacheRepository
+from cache_refresher.cache_refresher import CacheRefresher
+from cache_refresher.leader import LeadershipLost, RedisLeaderElection
+from cache_refresher.main import refresh
+from journeys.core.exceptions import FlightsProviderUnavailable
+from journeys.core.models import FlightEvent, Journey
+
+FLIGHT_EVENTS = [
+    FlightEvent(
+        flight_number='IB1234',
+        from_='BUE',
+        to='MAD',
+        departure_time=datetime(2021, 12, 31, 23, 59),
+        arrival_time=datetime(2022, 1, 1, 12),
+    ),
+]
+
+
+@patch('cache_refresher.leader.Redis')
+class TestRedisLeaderElection:
+    """Test acquiring and renewing the refresher leader lease."""
+
+    def test_lock_acquired(self, mock_redis):
+        connection = mock_redis.from_url.return_value
+        connection.set.return_value = True
+        leader_election = RedisLeaderElection(repository_uri='redis://', lock_key='LOCK', lease_ms=4000)
+
+        assert leader_election.acquire_or_renew()
+        connection.set.assert_called_once_with('LOCK', leader_election.token, nx=True, px=4000)
+
+    def test_lease_renewed_only_by_its_holder(self, mock_redis):
+        connection = mock_redis.from_url.return_value
+        connection.set.return_value = None
+        renew = MagicMock()
+        connection.register_script.return_value = renew
+        leader_election = RedisLeaderElection(repository_uri='redis://', lock_key='LOCK', lease_ms=4000)
+
+        renew.return_value = 1
+        assert leader_election.acquire_or_renew()
+        renew.return_value = 0
+        assert not leader_election.acquire_or_renew()
+        renew.assert_called_with(keys=['LOCK'], args=[leader_election.token, 4000])
+
+    def test_lease_renewed_while_refreshing(self, mock_redis):
+        """A refresh taking longer than the lease keeps it renewed in background, and renewals stop afterwards."""
+        renew = MagicMock(return_value=1)
+        mock_redis.from_url.return_value.register_script.return_value = renew
+        leader_election = RedisLeaderElection(repository_uri='redis://', lock_key='LOCK', lease_ms=4000)
+
+        with leader_election.renewing(every=0.01):
+            sleep(0.1)
+        renewals = renew.call_count
+        sleep(0.05)
+
+        assert renewals >= 2
+        assert renew.call_count == renewals
+
+    def test_renewals_held_while_writing(self, mock_redis):
+        """Renewing the watched lock would abort a write of this same leader."""
+        renew = MagicMock(return_value=1)
+        mock_redis.from_url.return_value.register_script.return_value = renew
+        leader_election = RedisLeaderElection(repository_uri='redis://', lock_key='LOCK', lease_ms=4000)
+
+        with leader_election.renewing(every=0.01):
+            with leader_election.renewals_held():
+                renewals = renew.call_count
+                sleep(0.05)
+                assert renew.call_count == renewals
+            sleep(0.05)
+
+        assert renew.call_count > renewals
+
+
+@patch('cache_refresher.cache.Redis')
+class TestRedisCacheRepository:
+    """Test cache writes fenced by the leader token."""
+
+    def build_repository(self, mock_redis, lock_holder: bytes):
+        leader_election = MagicMock(lock_key='LOCK', token=b'TOKEN')
+        pipeline = mock_redis.from_url.return_value.pipeline.return_value.__enter__.return_value
+        pipeline.get.return_value = lock_holder
+        repository = RedisCacheRepository(repository_uri='redis://', cache_key='KEY', leader_election=leader_election)
+        return repository, pipeline
+
+    def test_leader_writes(self, mock_redis):
+        repository, pipeline = self.build_repository(mock_redis, lock_holder=b'TOKEN')
+
+        repository.refresh_cache(FLIGHT_EVENTS)
+
+        pipeline.watch.assert_called_once_with('LOCK')
+        repository._leader_election.renewals_held.assert_called_once()
+        pipeline.mset.assert_called_once()
+        pipeline.execute.assert_called_once()
+
+    def test_former_leader_doesnt_write(self, mock_redis):
+        repository, pipeline = self.build_repository(mock_redis, lock_holder=b'OTHER_TOKEN')
+
+        with pytest.raises(LeadershipLost):
+            repository.refresh_cache(FLIGHT_EVENTS)
+
+        pipeline.execute.assert_not_called()
+
+    def test_flights_and_journeys_written_in_one_transaction(self, mock_redis):
+        """The API never reads a snapshot version together with journeys materialized from another snapshot."""
+        repository, pipeline = self.build_repository(mock_redis, lock_holder=b'TOKEN')
+
+        repository.refresh_cache(FLIGHT_EVENTS, {('BUE', 'MAD', date(2021, 12, 31)): [Journey(FLIGHT_EVENTS)]})
+
+        pipeline.mset.assert_called_once()
+        pipeline.delete.assert_called_once_with('KEY:JOURNEYS')
+        pipeline.hset.assert_called_once()
+        pipeline.execute.assert_called_once()
+
+
+class TestCacheRefresher:
+    """Test a refresher run, from fetching flights to writing the caches."""
+
+    def test_journeys_materialized_before_writing(self):
+        flights_repository = MagicMock()
+        flights_repository.get_flight_events.return_value = FLIGHT_EVENTS
+        cache_repository = MagicMock()
+        journeys_materializer = MagicMock(return_value={})
+        cache_refresher = CacheRefresher(
+            flights_repository=flights_repository,
+            cache_repository=cache_repository,
+            journeys_materializer=journeys_materializer,
+        )
+
+        cache_refresher.run()
+
+        journeys_materializer.assert_called_once_with(FLIGHT_EVENTS)
+        cache_repository.refresh_cache.assert_called_once_with(FLIGHT_EVENTS, {})
+
+
+class TestRefresh:
+    """Test a single refresher run from the main loop."""
+
+    def test_provider_failure_is_logged_and_retried_later(self):
+        cache_refresher = MagicMock()
+        cache_refresher.run.side_effect = FlightsProviderUnavailable('Provider answered 500.')
+
+        refresh(cache_refresher, MagicMock())
+
+        cache_refresher.run.assert_called_once()
+
+    def test_leadership_lost_is_raised(self):
+        cache_refresher = MagicMock()
+        cache_refresher.run.side_effect = LeadershipLost()
+
+        with pytest.raises(LeadershipLost):
+            refresh(cache_refresher, MagicMock())
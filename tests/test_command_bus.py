@@ -0,0 +1,144 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from dependency_injector.providers import Factory, Object
+
+from journeys.containers import JourneysCommandBus
+from journeys.core.actions import SearchJourneys, load_action
+from journeys.core.exceptions import SearchOutOfRetentionWindow
+from journeys.core.handlers import SearchJourneysHandler
+from journeys.core.middlewares import (
+    CommandMiddleware,
+    ResultCacheMiddleware,
+    RetentionWindowMiddleware,
+    SlowQueryLogMiddleware,
+)
+from journeys.core.models import FlightEvent, RetentionWindow
+
+ACTION = SearchJourneys(from_='BUE', to='MAD', date=date(2021, 12, 31))
+
+
+class RecordingMiddleware(CommandMiddleware):
+
+    def __init__(self, name: str, calls: list[str]):
+        self.name = name
+        self.calls = calls
+
+    def __call__(self, action, next_):
+        self.calls.append(self.name)
+        return next_(action)
+
+
+class TestJourneysCommandBus:
+    """Test dispatching actions through the middleware pipeline."""
+
+    def test_middlewares_wrap_handler_in_order(self):
+        calls = []
+        handler = MagicMock(side_effect=lambda action: calls.append('handler') or ['JOURNEY'])
+        command_bus = JourneysCommandBus(
+            {Factory(SearchJourneys): Object(handler)},
+            middlewares={Factory(SearchJourneys): [
+                Factory(RecordingMiddleware, 'outer', calls),
+                Factory(RecordingMiddleware, 'inner', calls),
+            ]},
+        )
+
+        assert command_bus.handle(ACTION) == ['JOURNEY']
+        assert calls == ['outer', 'inner', 'handler']
+        handler.assert_called_once_with(ACTION)
+
+    def test_registries_are_not_shared_between_buses(self):
+        JourneysCommandBus({Factory(SearchJourneys): Object(MagicMock())})
+        command_bus = JourneysCommandBus({})
+
+        assert command_bus._commands == {}
+
+    def test_result_cache_per_snapshot_version(self):
+        flights_repository = MagicMock()
+        flights_repository.get_snapshot_version.return_value = 'SNAPSHOT_VERSION'
+        handler = MagicMock(return_value=['JOURNEY'])
+        command_bus = JourneysCommandBus(
+            {Factory(SearchJourneys): Object(handler)},
+            middlewares={Factory(SearchJourneys): [
+                Factory(ResultCacheMiddleware, flights_repository=flights_repository, max_size=1),
+            ]},
+        )
+
+        command_bus.handle(ACTION)
+        command_bus.handle(ACTION)
+        flights_repository.get_snapshot_version.return_value = 'NEW_SNAPSHOT_VERSION'
+        command_bus.handle(ACTION)
+
+        assert handler.call_count == 2
+
+    def test_search_outside_retention_window_is_rejected(self):
+        handler = MagicMock(return_value=[])
+        command_bus = JourneysCommandBus(
+            {Factory(SearchJourneys): Object(handler)},
+            middlewares={Factory(SearchJourneys): [
+                Factory(RetentionWindowMiddleware, retention_window=RetentionWindow(past_days=1, future_days=2)),
+            ]},
+        )
+        today = datetime.now(timezone.utc).date()
+
+        assert command_bus.handle(SearchJourneys(from_='BUE', to='MAD', date=today + timedelta(days=2))) == []
+        with pytest.raises(SearchOutOfRetentionWindow):
+            command_bus.handle(SearchJourneys(from_='BUE', to='MAD', date=today + timedelta(days=3)))
+        with pytest.raises(SearchOutOfRetentionWindow):
+            command_bus.handle(SearchJourneys(from_='BUE', to='MAD', date=today - timedelta(days=2)))
+        handler.assert_called_once()
+
+
+class TestSlowQueryLogMiddleware:
+    """Test logging slow searches with what they went through."""
+
+    def setup_method(self) -> None:
+        self.flights_repository = MagicMock()
+        self.flights_repository.get_snapshot_version.return_value = 'SNAPSHOT_VERSION'
+        self.flights_repository.get_flight_events.return_value = [
+            FlightEvent(
+                flight_number='IB1234',
+                from_='BUE',
+                to='MAD',
+                departure_time=datetime(2021, 12, 31, 12),
+                arrival_time=datetime(2021, 12, 31, 20),
+            ),
+        ]
+        self.logger = MagicMock()
+
+    def build_command_bus(self, threshold: float) -> JourneysCommandBus:
+        return JourneysCommandBus(
+            {Factory(SearchJourneys): Object(SearchJourneysHandler(flights_repository=self.flights_repository))},
+            middlewares={Factory(SearchJourneys): [
+                Factory(
+                    SlowQueryLogMiddleware,
+                    flights_repository=self.flights_repository,
+                    threshold=threshold,
+                    logger=self.logger,
+                ),
+            ]},
+        )
+
+    def test_slow_search_is_logged_with_stats(self):
+        command_bus = self.build_command_bus(threshold=1e-9)
+        action = SearchJourneys(from_=frozenset({'BUE', 'COR'}), to='MAD', date=date(2021, 12, 31))
+
+        assert len(command_bus.handle(action)) == 1
+
+        entry = json.loads(self.logger.info.call_args.args[0])
+        assert entry['action'] == 'SearchJourneys'
+        assert entry['params'] == {'from_': ['BUE', 'COR'], 'to': 'MAD', 'date': '2021-12-31'}
+        assert load_action(entry) == action
+        assert (entry['snapshot_version'], entry['events'], entry['first_legs'], entry['results'], entry['error']) == (
+            'SNAPSHOT_VERSION', 1, 1, 1, None,
+        )
+        assert set(entry['timings_ms']) == {'load', 'index', 'search', 'total'}
+
+    def test_fast_search_is_not_logged(self):
+        command_bus = self.build_command_bus(threshold=60_000)
+
+        command_bus.handle(ACTION)
+
+        self.logger.info.assert_not_called()
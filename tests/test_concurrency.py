@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep
+
+import pytest
+
+from journeys.core.concurrency import SingleFlight
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent calls sharing the same key."""
+
+    def setup_method(self) -> None:
+        self.single_flight = SingleFlight()
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Calls arriving while the first one is in flight get its result without running the function."""
+        release = Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            release.wait(timeout=5)
+            return 'SNAPSHOT'
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(self.single_flight.do, 'KEY', load)]
+            while not calls:
+                sleep(0.001)
+            futures += [executor.submit(self.single_flight.do, 'KEY', load) for _ in range(3)]
+            sleep(0.05)
+            release.set()
+            results = [future.result(timeout=5) for future in futures]
+
+        assert results == ['SNAPSHOT'] * 4
+        assert len(calls) == 1
+        assert self.single_flight._calls == {}
+
+    def test_sequential_calls_run_again(self):
+        """Once a call finished, the key is released and the next call executes the function."""
+        assert self.single_flight.do('KEY', lambda: 1) == 1
+        assert self.single_flight.do('KEY', lambda: 2) == 2
+
+    def test_exception_is_propagated_and_key_released(self):
+        """A failing call raises to its caller and doesn't leave the key in flight."""
+        def fail():
+            raise ValueError('MOCKED_ERROR')
+
+        with pytest.raises(ValueError):
+            self.single_flight.do('KEY', fail)
+        assert self.single_flight.do('KEY', lambda: 'OK') == 'OK'
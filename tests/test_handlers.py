@@ -1,8 +1,12 @@
 from datetime import datetime, date
+from time import monotonic
 from unittest.mock import MagicMock
 
-from journeys.core.actions import SearchJourneys
-from journeys.core.handlers import SearchJourneysHandler
+import pytest
+
+from journeys.core.actions import SearchJourneys, SearchRoundTrip
+from journeys.core.exceptions import SearchDeadlineExceeded
+from journeys.core.handlers import SearchJourneysHandler, SearchRoundTripHandler
 from journeys.core.models import FlightEvent, Journey
 
 
@@ -433,3 +437,182 @@ class TestSearchJourneysHandler:
         ]
         for journey in search_journeys_result:
             assert journey.connections == len(journey.flight_events) - 1 if journey.flight_events else 0
+
+    def test_materialized_journeys_are_returned(self):
+        """Journeys were already materialized for the search, flight events aren't even fetched."""
+        materialized_journeys = [Journey(flight_events=[])]
+        self.handler.journeys_repository = MagicMock()
+        self.handler.journeys_repository.get_journeys.return_value = materialized_journeys
+
+        search_journeys_result = self.handler(SearchJourneys(from_='BUE', to='BER', date=date(2022, 1, 1)))
+
+        assert search_journeys_result is materialized_journeys
+        self.handler.flights_repository.get_flight_events.assert_not_called()
+
+    def test_missing_materialized_journeys_are_computed(self):
+        """Journeys weren't materialized for the search, they're computed from flight events."""
+        self.handler.journeys_repository = MagicMock()
+        self.handler.journeys_repository.get_journeys.return_value = None
+        self.handler.flights_repository.get_flight_events.return_value = []
+
+        search_journeys_result = self.handler(SearchJourneys(from_='BUE', to='BER', date=date(2022, 1, 1)))
+
+        assert search_journeys_result == []
+        self.handler.flights_repository.get_flight_events.assert_called_once()
+
+    def test_deadline_reached(self):
+        """The search deadline was already reached, the journeys found until then are kept in the exception."""
+        self.handler.flights_repository.get_flight_events.return_value = [
+            FlightEvent(
+                flight_number='IB1234',
+                from_='BUE',
+                to='MAD',
+                departure_time=datetime(2021, 12, 31, 23, 59),
+                arrival_time=datetime(2022, 1, 1, 12),
+            )
+        ]
+
+        with pytest.raises(SearchDeadlineExceeded) as deadline_exceeded:
+            self.handler(SearchJourneys(from_='BUE', to='MAD', date=date(2021, 12, 31), deadline=monotonic() - 1))
+
+        assert deadline_exceeded.value.journeys == []
+
+    def test_origin_and_destination_sets(self):
+        """Any origin to any destination is searched in one pass, directly or with a connection."""
+        self.handler.flights_repository.get_flight_events.return_value = [
+            FlightEvent(
+                flight_number='AR1234',
+                from_='EZE',
+                to='MAD',
+                departure_time=datetime(2024, 9, 12, 12),
+                arrival_time=datetime(2024, 9, 13, 0),
+            ),
+            FlightEvent(
+                flight_number='AR5678',
+                from_='AEP',
+                to='GRU',
+                departure_time=datetime(2024, 9, 12, 8),
+                arrival_time=datetime(2024, 9, 12, 11),
+            ),
+            FlightEvent(
+                flight_number='LA9012',
+                from_='GRU',
+                to='BCN',
+                departure_time=datetime(2024, 9, 12, 13),
+                arrival_time=datetime(2024, 9, 13, 1),
+            ),
+            FlightEvent(
+                flight_number='LA3456',
+                from_='GRU',
+                to='LIS',
+                departure_time=datetime(2024, 9, 12, 13),
+                arrival_time=datetime(2024, 9, 13, 1),
+            ),
+            FlightEvent(
+                flight_number='AR7890',
+                from_='COR',
+                to='MAD',
+                departure_time=datetime(2024, 9, 12, 12),
+                arrival_time=datetime(2024, 9, 13, 0),
+            ),
+        ]
+
+        search_journeys_result = self.handler(
+            SearchJourneys(from_=frozenset({'EZE', 'AEP'}), to=frozenset({'MAD', 'BCN'}), date=date(2024, 9, 12))
+        )
+
+        assert [
+            [(flight_event.from_, flight_event.to) for flight_event in journey.flight_events]
+            for journey in search_journeys_result
+        ] == [[('AEP', 'GRU'), ('GRU', 'BCN')], [('EZE', 'MAD')]]
+
+    def test_airport_sets_are_not_materialized(self):
+        """Materialized journeys are only kept per single origin and destination."""
+        self.handler.journeys_repository = MagicMock()
+        self.handler.flights_repository.get_flight_events.return_value = []
+
+        self.handler(SearchJourneys(from_=frozenset({'EZE', 'AEP'}), to='MAD', date=date(2024, 9, 12)))
+
+        self.handler.journeys_repository.get_journeys.assert_not_called()
+
+    def test_single_airport_sets_are_plain_codes(self):
+        action = SearchJourneys(from_=['BUE'], to=frozenset({'MAD'}), date=date(2024, 9, 12))
+
+        assert action == SearchJourneys(from_='BUE', to='MAD', date=date(2024, 9, 12))
+        assert action.origins == frozenset({'BUE'})
+
+
+class TestSearchRoundTripHandler:
+    """Test round trip searches, pairing outbound and return journeys from a single snapshot."""
+
+    def setup_method(self) -> None:
+        self.handler = SearchRoundTripHandler(flights_repository=MagicMock())
+        self.handler.flights_repository.get_flight_events.return_value = [
+            FlightEvent(
+                flight_number='IB1234',
+                from_='BUE',
+                to='MAD',
+                departure_time=datetime(2024, 9, 12, 12),
+                arrival_time=datetime(2024, 9, 13, 0),
+            ),
+            FlightEvent(
+                flight_number='IB5678',
+                from_='MAD',
+                to='BUE',
+                departure_time=datetime(2024, 9, 14, 12),
+                arrival_time=datetime(2024, 9, 15, 0),
+            ),
+            FlightEvent(
+                flight_number='IB9012',
+                from_='MAD',
+                to='BUE',
+                departure_time=datetime(2024, 9, 16, 12),
+                arrival_time=datetime(2024, 9, 17, 0),
+            ),
+            FlightEvent(
+                flight_number='IB3456',
+                from_='MAD',
+                to='BUE',
+                departure_time=datetime(2024, 9, 12, 18),
+                arrival_time=datetime(2024, 9, 13, 6),
+            ),
+        ]
+
+    def test_pairs_journeys_returning_within_stay(self):
+        """Return journeys departing within the stay bounds are paired, sorted by return departure."""
+        round_trips = self.handler(
+            SearchRoundTrip(from_='BUE', to='MAD', date=date(2024, 9, 12), min_stay=0, max_stay=4)
+        )
+
+        assert [
+            (round_trip.outbound.flight_events[0].departure_time, round_trip.inbound.flight_events[0].departure_time)
+            for round_trip in round_trips
+        ] == [
+            (datetime(2024, 9, 12, 12), datetime(2024, 9, 14, 12)),
+            (datetime(2024, 9, 12, 12), datetime(2024, 9, 16, 12)),
+        ]
+        self.handler.flights_repository.get_flight_events.assert_called_once()
+
+    def test_return_departing_before_outbound_arrival_is_not_paired(self):
+        """Same day return departs before the outbound flight lands."""
+        round_trips = self.handler(
+            SearchRoundTrip(from_='BUE', to='MAD', date=date(2024, 9, 12), min_stay=0, max_stay=0)
+        )
+
+        assert round_trips == []
+
+    def test_limit(self):
+        round_trips = self.handler(
+            SearchRoundTrip(from_='BUE', to='MAD', date=date(2024, 9, 12), min_stay=2, max_stay=4, limit=1)
+        )
+
+        assert len(round_trips) == 1
+        assert round_trips[0].inbound.flight_events[0].departure_time == datetime(2024, 9, 14, 12)
+
+    def test_deadline_reached(self):
+        with pytest.raises(SearchDeadlineExceeded) as deadline_exceeded:
+            self.handler(SearchRoundTrip(
+                from_='BUE', to='MAD', date=date(2024, 9, 12), min_stay=2, max_stay=4, deadline=monotonic() - 1,
+            ))
+
+        assert deadline_exceeded.value.journeys == []
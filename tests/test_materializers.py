@@ -0,0 +1,69 @@
+from datetime import date, datetime
+from itertools import product
+from unittest.mock import MagicMock
+
+from journeys.core.actions import SearchJourneys
+from journeys.core.handlers import SearchJourneysHandler
+from journeys.core.materializers import JourneysMaterializer
+from journeys.core.models import FlightEvent
+
+FLIGHT_EVENTS = [
+    FlightEvent(
+        flight_number='IB1234',
+        from_='BUE',
+        to='MAD',
+        departure_time=datetime(2022, 1, 1, 1),
+        arrival_time=datetime(2022, 1, 1, 12),
+    ),
+    FlightEvent(
+        flight_number='IB5678',
+        from_='MAD',
+        to='BER',
+        departure_time=datetime(2022, 1, 1, 14),
+        arrival_time=datetime(2022, 1, 1, 15, 30),
+    ),
+    FlightEvent(
+        flight_number='IB9012',
+        from_='BUE',
+        to='BER',
+        departure_time=datetime(2022, 1, 1, 0, 30),
+        arrival_time=datetime(2022, 1, 1, 12),
+    ),
+    FlightEvent(
+        flight_number='IB3456',
+        from_='MAD',
+        to='BUE',
+        departure_time=datetime(2022, 1, 1, 13),
+        arrival_time=datetime(2022, 1, 2, 0),
+    ),
+    FlightEvent(
+        flight_number='IB7890',
+        from_='MAD',
+        to='PAR',
+        departure_time=datetime(2022, 1, 1, 18),
+        arrival_time=datetime(2022, 1, 1, 20),
+    ),
+    FlightEvent(
+        flight_number='IB1122',
+        from_='BER',
+        to='PAR',
+        departure_time=datetime(2022, 1, 1, 16),
+        arrival_time=datetime(2022, 1, 1, 18),
+    ),
+]
+
+
+class TestJourneysMaterializer:
+    """Test that precomputed journeys are exactly the ones the handler would build."""
+
+    def test_matches_handler_for_every_search(self):
+        handler = SearchJourneysHandler(flights_repository=MagicMock())
+        handler.flights_repository.get_flight_events.return_value = FLIGHT_EVENTS
+
+        materialized_journeys = JourneysMaterializer()(FLIGHT_EVENTS)
+
+        cities = {'BUE', 'MAD', 'BER', 'PAR'}
+        for from_, to, date_ in product(cities, cities, [date(2022, 1, 1), date(2022, 1, 2)]):
+            expected_journeys = handler(SearchJourneys(from_=from_, to=to, date=date_))
+            assert materialized_journeys.get((from_, to, date_), []) == expected_journeys
+        assert len(materialized_journeys[('BUE', 'BER', date(2022, 1, 1))]) == 2
@@ -0,0 +1,105 @@
+from datetime import date, datetime
+from functools import partial
+from time import monotonic
+from unittest.mock import MagicMock
+
+import pytest
+
+from journeys.app.pool import ProcessPoolSearchJourneysHandler
+from journeys.app.repositories import FlightsSnapshotFileRepository
+from journeys.app.snapshots import write_snapshot
+from journeys.core.actions import SearchJourneys
+from journeys.core.handlers import SearchJourneysHandler
+from journeys.core.exceptions import SearchDeadlineExceeded, SearchTimeout
+from journeys.core.models import FlightEvent, Journey
+
+
+def build_search_handler(snapshot_path: str) -> SearchJourneysHandler:
+    return SearchJourneysHandler(flights_repository=FlightsSnapshotFileRepository(snapshot_path=snapshot_path))
+
+
+class TestProcessPoolSearchJourneysHandler:
+    """Test searches offloaded to a pool of worker processes."""
+
+    def setup_method(self) -> None:
+        self.handler = None
+
+    def teardown_method(self) -> None:
+        if self.handler is not None:
+            self.handler.shutdown()
+
+    def build_handler(self, tmp_path, timeout: float) -> ProcessPoolSearchJourneysHandler:
+        path = str(tmp_path / 'snapshot.bin')
+        write_snapshot(path, [
+            FlightEvent(
+                flight_number='IB1234',
+                from_='BUE',
+                to='MAD',
+                departure_time=datetime(2021, 12, 31, 23, 59),
+                arrival_time=datetime(2022, 1, 1, 12),
+            ),
+        ])
+        self.handler = ProcessPoolSearchJourneysHandler(
+            handler_factory=partial(build_search_handler, path),
+            pool_size=1,
+            timeout=timeout,
+        )
+        return self.handler
+
+    def test_search_runs_in_worker_process(self, tmp_path):
+        """The worker process loads the snapshot on its own and returns the journeys found."""
+        handler = self.build_handler(tmp_path, timeout=30)
+
+        search_journeys_result = handler(SearchJourneys(from_='BUE', to='MAD', date=date(2021, 12, 31)))
+
+        assert search_journeys_result == [
+            Journey(
+                flight_events=[
+                    FlightEvent(
+                        flight_number='XX1234',
+                        from_='BUE',
+                        to='MAD',
+                        departure_time=datetime(2021, 12, 31, 23, 59),
+                        arrival_time=datetime(2022, 1, 1, 12),
+                    ),
+                ]
+            )
+        ]
+
+    def test_workers_are_spawned_with_their_snapshot(self, tmp_path):
+        """Workers aren't forked from the threaded API process, and report the flight events they loaded."""
+        handler = self.build_handler(tmp_path, timeout=30)
+
+        assert handler._executor._mp_context.get_start_method() == 'spawn'
+        assert handler.count_flight_events() == 1
+
+    def test_search_timeout(self, tmp_path):
+        """A search not completed within the timeout raises SearchTimeout."""
+        handler = self.build_handler(tmp_path, timeout=0)
+
+        with pytest.raises(SearchTimeout):
+            handler(SearchJourneys(from_='BUE', to='MAD', date=date(2021, 12, 31)))
+
+    def test_search_deadline_exceeded(self, tmp_path):
+        """A search reaching its deadline in a worker raises SearchDeadlineExceeded, and the pool keeps working."""
+        handler = self.build_handler(tmp_path, timeout=30)
+
+        with pytest.raises(SearchDeadlineExceeded) as deadline_exceeded:
+            handler(SearchJourneys(from_='BUE', to='MAD', date=date(2021, 12, 31), deadline=monotonic() - 1))
+
+        assert deadline_exceeded.value.journeys == []
+        assert len(handler(SearchJourneys(from_='BUE', to='MAD', date=date(2021, 12, 31)))) == 1
+
+    def test_worker_stops_searching_at_timeout(self, tmp_path):
+        """Searches get a deadline at the timeout, so workers don't keep running searches nobody waits for."""
+        handler = self.build_handler(tmp_path, timeout=30)
+        handler._executor.shutdown()
+        handler._executor = MagicMock()
+        handler._executor.submit.return_value.result.return_value = []
+
+        handler(SearchJourneys(from_='BUE', to='MAD', date=date(2021, 12, 31)))
+        handler(SearchJourneys(from_='BUE', to='MAD', date=date(2021, 12, 31), deadline=monotonic() + 1))
+
+        deadlines = [call.args[1].deadline for call in handler._executor.submit.call_args_list]
+        assert monotonic() + 20 < deadlines[0] <= monotonic() + 30
+        assert deadlines[1] <= monotonic() + 1
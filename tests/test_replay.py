@@ -0,0 +1,118 @@
+import json
+import logging
+from datetime import date, datetime
+
+from journeys.app.logs import SLOW_QUERY_LOGGER, create_slow_query_logger
+from journeys.app.snapshots import snapshot_version, write_snapshot
+from journeys.core.actions import SearchJourneys, SearchRoundTrip, dump_action
+from journeys.core.models import FlightEvent
+from journeys.tools.replay import replay
+
+FLIGHT_EVENTS = [
+    FlightEvent(
+        flight_number='IB1234',
+        from_='BUE',
+        to='MAD',
+        departure_time=datetime(2024, 9, 12, 12),
+        arrival_time=datetime(2024, 9, 13, 0),
+    ),
+    FlightEvent(
+        flight_number='IB5678',
+        from_='MAD',
+        to='BUE',
+        departure_time=datetime(2024, 9, 19, 12),
+        arrival_time=datetime(2024, 9, 20, 0),
+    ),
+]
+
+
+class TestReplay:
+    """Test replaying slow query log entries against a saved snapshot."""
+
+    def test_entries_are_searched_again(self, tmp_path):
+        snapshot_path = str(tmp_path / 'snapshot.bin')
+        write_snapshot(snapshot_path, FLIGHT_EVENTS)
+        log_path = tmp_path / 'slow_queries.log'
+        entries = [
+            {
+                **dump_action(SearchJourneys(from_='BUE', to='MAD', date=date(2024, 9, 12))),
+                'snapshot_version': snapshot_version(FLIGHT_EVENTS),
+                'results': 1,
+                'connections_evaluated': 0,
+                'timings_ms': {'total': 120.0},
+            },
+            {
+                **dump_action(SearchRoundTrip(from_='BUE', to='MAD', date=date(2024, 9, 12), min_stay=7, max_stay=7)),
+                'snapshot_version': 'OTHER_SNAPSHOT_VERSION',
+                'results': 1,
+                'connections_evaluated': 0,
+                'timings_ms': {'total': 250.0},
+            },
+        ]
+        log_path.write_text(''.join(json.dumps(entry) + '\n' for entry in entries))
+
+        replayed = list(replay(str(log_path), snapshot_path))
+
+        assert [(entry['action'], entry['same_snapshot']) for entry in replayed] == [
+            ('SearchJourneys', True),
+            ('SearchRoundTrip', False),
+        ]
+        assert [entry['replayed']['results'] for entry in replayed] == [1, 1]
+        assert {'load', 'index', 'search', 'total'} <= set(replayed[0]['replayed']['timings_ms'])
+
+    def test_entries_logged_with_retention_window_are_searched_on_pruned_flights(self, tmp_path):
+        """The retention window suffix of the logged version is stripped, and flights outside it aren't searched."""
+        snapshot_path = str(tmp_path / 'snapshot.bin')
+        write_snapshot(snapshot_path, FLIGHT_EVENTS)
+        log_path = tmp_path / 'slow_queries.log'
+        entries = [
+            {
+                **dump_action(SearchJourneys(from_='BUE', to='MAD', date=date(2024, 9, 12))),
+                'snapshot_version': f'{snapshot_version(FLIGHT_EVENTS)}:2024-09-01:2024-09-30',
+                'results': 1,
+                'connections_evaluated': 0,
+                'timings_ms': {'total': 120.0},
+            },
+            {
+                **dump_action(SearchJourneys(from_='BUE', to='MAD', date=date(2024, 9, 12))),
+                'snapshot_version': f'{snapshot_version(FLIGHT_EVENTS)}:2024-09-13:2024-09-30',
+                'results': 0,
+                'connections_evaluated': 0,
+                'timings_ms': {'total': 120.0},
+            },
+        ]
+        log_path.write_text(''.join(json.dumps(entry) + '\n' for entry in entries))
+
+        replayed = list(replay(str(log_path), snapshot_path))
+
+        assert [entry['same_snapshot'] for entry in replayed] == [True, True]
+        assert [entry['replayed']['results'] for entry in replayed] == [1, 0]
+
+
+class TestSlowQueryLogger:
+    """Test where slow query log entries are written."""
+
+    def setup_method(self) -> None:
+        self.handlers = logging.getLogger(SLOW_QUERY_LOGGER).handlers
+        logging.getLogger(SLOW_QUERY_LOGGER).handlers = []
+
+    def teardown_method(self) -> None:
+        for handler in logging.getLogger(SLOW_QUERY_LOGGER).handlers:
+            handler.close()
+        logging.getLogger(SLOW_QUERY_LOGGER).handlers = self.handlers
+
+    def test_entries_written_to_stderr_without_path(self, capsys):
+        """The root logger is left unconfigured by uvicorn, entries must not depend on it."""
+        logger = create_slow_query_logger(path='', max_bytes=0, backup_count=0)
+
+        logger.info('{"action": "SearchJourneys"}')
+
+        assert capsys.readouterr().err == '{"action": "SearchJourneys"}\n'
+
+    def test_entries_written_to_file(self, tmp_path):
+        path = tmp_path / 'slow_queries.log'
+        logger = create_slow_query_logger(path=str(path), max_bytes=1_000_000, backup_count=1)
+
+        logger.info('{"action": "SearchJourneys"}')
+
+        assert path.read_text() == '{"action": "SearchJourneys"}\n'
@@ -0,0 +1,356 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from threading import Barrier, Event
+from time import sleep
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis import ConnectionError, ResponseError
+
+from journeys.app.repositories import (
+    FlightsCacheRepository,
+    FlightsInMemoryCacheRepository,
+    FlightsRetentionRepository,
+    FlightsSnapshotBackupRepository,
+    JourneysCacheRepository,
+)
+from journeys.app.snapshots import snapshot_version, write_snapshot
+from journeys.core.actions import SearchJourneys
+from journeys.core.models import FlightEvent, RetentionWindow
+
+
+def build_flight_event(flight_number: str) -> FlightEvent:
+    return FlightEvent(
+        flight_number=flight_number,
+        from_='BUE',
+        to='MAD',
+        departure_time=datetime(2021, 12, 31, 23),
+        arrival_time=datetime(2022, 1, 1, 12),
+    )
+
+
+def wait_revalidation(repository: FlightsInMemoryCacheRepository) -> None:
+    while repository._revalidating:
+        sleep(0.001)
+
+
+class TestFlightsInMemoryCacheRepository:
+    """Test the in-process stale-while-revalidate cache."""
+
+    def setup_method(self) -> None:
+        self.flights_repository = MagicMock()
+
+    def test_first_call_loads_from_wrapped_repository(self):
+        """Nothing is cached yet, so the first call waits on the wrapped repository."""
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        repository = FlightsInMemoryCacheRepository(flights_repository=self.flights_repository, ttl=60)
+
+        assert repository.get_flight_events() == [build_flight_event('IB1234')]
+        assert repository.get_flight_events() == [build_flight_event('IB1234')]
+        self.flights_repository.get_flight_events.assert_called_once()
+
+    def test_stale_snapshot_is_served_while_revalidating(self):
+        """Once expired, the stale snapshot is returned and a single background fetch refreshes it."""
+        release = Event()
+        fetched = Event()
+
+        def slow_fetch():
+            release.wait(timeout=5)
+            fetched.set()
+            return [build_flight_event('IB5678')]
+
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        repository = FlightsInMemoryCacheRepository(flights_repository=self.flights_repository, ttl=0)
+        repository.get_flight_events()
+        self.flights_repository.get_flight_events.side_effect = slow_fetch
+
+        assert repository.get_flight_events() == [build_flight_event('IB1234')]
+        assert repository.get_flight_events() == [build_flight_event('IB1234')]
+        release.set()
+        assert fetched.wait(timeout=5)
+        wait_revalidation(repository)
+
+        assert self.flights_repository.get_flight_events.call_count == 2
+        assert repository.get_flight_events()[0].flight_number == 'IB5678'
+
+    def test_failed_revalidation_keeps_stale_snapshot(self):
+        """The wrapped repository failing in background doesn't drop the last good snapshot."""
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        repository = FlightsInMemoryCacheRepository(flights_repository=self.flights_repository, ttl=0)
+        repository.get_flight_events()
+        self.flights_repository.get_flight_events.side_effect = Exception('MOCKED_PROVIDER_ERROR')
+
+        repository.get_flight_events()
+        wait_revalidation(repository)
+
+        assert repository.get_flight_events() == [build_flight_event('IB1234')]
+
+    def test_snapshot_version_of_wrapped_repository_is_kept(self):
+        """The wrapped version names the file flights came from, e.g. a backup, else the flights held are hashed."""
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        self.flights_repository.get_snapshot_version.return_value = 'SOURCE_VERSION:2021-12-01:2022-01-31'
+        repository = FlightsInMemoryCacheRepository(flights_repository=self.flights_repository, ttl=60)
+        repository.get_flight_events()
+
+        assert repository.get_snapshot_version() == 'SOURCE_VERSION:2021-12-01:2022-01-31'
+
+        self.flights_repository.get_snapshot_version.return_value = None
+        repository = FlightsInMemoryCacheRepository(flights_repository=self.flights_repository, ttl=60)
+        repository.get_flight_events()
+
+        assert repository.get_snapshot_version() == snapshot_version([build_flight_event('IB1234')])
+
+
+class TestFlightsRetentionRepository:
+    """Test pruning of flights departing outside the retention window."""
+
+    def test_flights_outside_window_are_pruned(self):
+        today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0, tzinfo=None)
+        flight_events = [
+            FlightEvent(
+                flight_number=f'IB{days + 5:04}',
+                from_='BUE',
+                to='MAD',
+                departure_time=today + timedelta(days=days),
+                arrival_time=today + timedelta(days=days, hours=12),
+            )
+            for days in range(-3, 5)
+        ]
+        flights_repository = MagicMock()
+        flights_repository.get_flight_events.return_value = flight_events
+        repository = FlightsRetentionRepository(
+            flights_repository=flights_repository,
+            retention_window=RetentionWindow(past_days=1, future_days=2),
+        )
+
+        assert repository.get_flight_events() == flight_events[2:7]
+
+    def test_pruned_flights_are_kept_for_the_same_snapshot(self):
+        """The same snapshot object is pruned once, so searches keep hitting the same index."""
+        flights_repository = MagicMock()
+        flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        repository = FlightsRetentionRepository(
+            flights_repository=flights_repository,
+            retention_window=RetentionWindow(past_days=10_000, future_days=10_000),
+        )
+
+        pruned = repository.get_flight_events()
+        assert repository.get_flight_events() is pruned
+        flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        assert repository.get_flight_events() is not pruned
+
+    def test_no_window_keeps_every_flight(self):
+        flights_repository = MagicMock()
+        flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        repository = FlightsRetentionRepository(flights_repository=flights_repository, retention_window=None)
+
+        assert repository.get_flight_events() == [build_flight_event('IB1234')]
+
+
+class TestFlightsSnapshotBackupRepository:
+    """Test the local backup of the last good snapshot."""
+
+    def setup_method(self) -> None:
+        self.flights_repository = MagicMock()
+        self.flights_repository.get_snapshot_version.return_value = None
+
+    def test_backup_is_served_first_on_restart(self, tmp_path):
+        """A backup exists from a previous run, the first call doesn't go to the wrapped repository."""
+        path = str(tmp_path / 'backup.bin')
+        write_snapshot(path, [build_flight_event('IB1234')])
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB5678')]
+        repository = FlightsSnapshotBackupRepository(flights_repository=self.flights_repository, backup_path=path)
+
+        assert list(repository.get_flight_events()) == [build_flight_event('IB1234')]
+        assert repository.get_snapshot_age() is not None
+        self.flights_repository.get_flight_events.assert_not_called()
+        assert repository.get_flight_events() == [build_flight_event('IB5678')]
+
+    def test_backup_is_only_served_on_failure_unless_first(self, tmp_path):
+        """The cache refresher goes to the provider first, so a stale backup doesn't overwrite fresher cached data."""
+        path = str(tmp_path / 'backup.bin')
+        write_snapshot(path, [build_flight_event('IB1234')])
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB5678')]
+        repository = FlightsSnapshotBackupRepository(
+            flights_repository=self.flights_repository,
+            backup_path=path,
+            serve_backup_first=False,
+        )
+
+        assert repository.get_flight_events() == [build_flight_event('IB5678')]
+        self.flights_repository.get_flight_events.side_effect = Exception('MOCKED_PROVIDER_ERROR')
+        assert list(repository.get_flight_events()) == [build_flight_event('IB5678')]
+
+    def test_good_snapshot_is_persisted_and_served_on_failure(self, tmp_path):
+        """Results are persisted, then served when the wrapped repository fails or comes back empty."""
+        path = str(tmp_path / 'backup.bin')
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        repository = FlightsSnapshotBackupRepository(flights_repository=self.flights_repository, backup_path=path)
+        repository.get_flight_events()
+
+        self.flights_repository.get_flight_events.return_value = []
+        assert list(repository.get_flight_events()) == [build_flight_event('IB1234')]
+        self.flights_repository.get_flight_events.side_effect = Exception('MOCKED_PROVIDER_ERROR')
+        assert list(repository.get_flight_events()) == [build_flight_event('IB1234')]
+
+        restarted_repository = FlightsSnapshotBackupRepository(flights_repository=MagicMock(), backup_path=path)
+        assert list(restarted_repository.get_flight_events()) == [build_flight_event('IB1234')]
+
+    def test_backup_version_is_reported_for_unversioned_source(self, tmp_path):
+        """The HTTP provider has no snapshot version, the one of the flights served and backed up is reported."""
+        path = str(tmp_path / 'backup.bin')
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        repository = FlightsSnapshotBackupRepository(flights_repository=self.flights_repository, backup_path=path)
+        repository.get_flight_events()
+
+        assert repository.get_snapshot_version() == snapshot_version([build_flight_event('IB1234')])
+        restarted_repository = FlightsSnapshotBackupRepository(flights_repository=MagicMock(), backup_path=path)
+        assert restarted_repository.get_snapshot_version() == repository.get_snapshot_version()
+
+    def test_new_source_version_is_hashed_once(self, tmp_path):
+        """Concurrent calls all seeing a new source version don't each hash and persist the whole timetable."""
+        fetched = Barrier(4)
+
+        def fetch():
+            fetched.wait(timeout=5)
+            return [build_flight_event('IB1234')]
+
+        self.flights_repository.get_snapshot_version.return_value = 'V2'
+        self.flights_repository.get_flight_events.side_effect = fetch
+        repository = FlightsSnapshotBackupRepository(
+            flights_repository=self.flights_repository,
+            backup_path=str(tmp_path / 'backup.bin'),
+        )
+
+        with patch('journeys.app.repositories.snapshot_version', wraps=snapshot_version) as hash_snapshot:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for _ in range(4):
+                    executor.submit(repository.get_flight_events)
+
+        hash_snapshot.assert_called_once()
+
+    def test_backup_version_is_served_when_source_version_fails(self, tmp_path):
+        """Redis going down after startup makes the version check fail too, the backup keeps being served."""
+        path = str(tmp_path / 'backup.bin')
+        self.flights_repository.get_flight_events.return_value = [build_flight_event('IB1234')]
+        repository = FlightsSnapshotBackupRepository(flights_repository=self.flights_repository, backup_path=path)
+        repository.get_flight_events()
+
+        self.flights_repository.get_snapshot_version.side_effect = ConnectionError('MOCKED_REDIS_DOWN')
+        self.flights_repository.get_flight_events.side_effect = ConnectionError('MOCKED_REDIS_DOWN')
+
+        assert repository.get_snapshot_version() == snapshot_version([build_flight_event('IB1234')])
+        assert list(repository.get_flight_events()) == [build_flight_event('IB1234')]
+
+    def test_failure_without_backup_is_raised(self, tmp_path):
+        self.flights_repository.get_flight_events.side_effect = Exception('MOCKED_PROVIDER_ERROR')
+        repository = FlightsSnapshotBackupRepository(
+            flights_repository=self.flights_repository,
+            backup_path=str(tmp_path / 'backup.bin'),
+        )
+
+        with pytest.raises(Exception):
+            repository.get_flight_events()
+
+
+@patch('journeys.app.repositories.Redis')
+class TestFlightsCacheRepository:
+    """Test reusing the decoded timetable until Redis holds a new one."""
+
+    def setup_cache(self, mock_redis, values: dict) -> MagicMock:
+        connection = mock_redis.from_url.return_value
+        connection.get.side_effect = values.get
+        return connection
+
+    def test_decoded_timetable_is_kept_while_version_is_unchanged(self, mock_redis):
+        values = {
+            'KEY:VERSION': b'V1',
+            'KEY': json.dumps([{
+                'flight_number': 'IB1234',
+                'from_': 'BUE',
+                'to': 'MAD',
+                'departure_time': '2021-12-31T23:00:00',
+                'arrival_time': '2022-01-01T12:00:00',
+            }]).encode(),
+        }
+        connection = self.setup_cache(mock_redis, values)
+        repository = FlightsCacheRepository(repository_uri='redis://', cache_key='KEY')
+
+        flight_events = repository.get_flight_events()
+        assert repository.get_flight_events() is flight_events
+        values['KEY:VERSION'], values['KEY'] = b'V2', values['KEY'] + b' '
+        assert repository.get_flight_events() is not flight_events
+
+        assert [call.args[0] for call in connection.get.call_args_list] == [
+            'KEY:VERSION', 'KEY', 'KEY:VERSION', 'KEY:VERSION', 'KEY',
+        ]
+
+    def test_unchanged_value_is_not_decoded_again_without_version(self, mock_redis):
+        """The client-side cache hands back the same value object until Redis invalidates it."""
+        self.setup_cache(mock_redis, {'KEY': b'[]'})
+        repository = FlightsCacheRepository(repository_uri='redis://', cache_key='KEY', client_side_cache_size=16)
+
+        flight_events = repository.get_flight_events()
+
+        assert repository.get_flight_events() is flight_events
+
+    def test_connects_on_first_use(self, mock_redis):
+        """Redis being down doesn't prevent building the repository, only using it."""
+        mock_redis.from_url.return_value.ping.side_effect = ConnectionError('MOCKED_REDIS_DOWN')
+
+        repository = FlightsCacheRepository(repository_uri='redis://', cache_key='KEY', client_side_cache_size=16)
+
+        mock_redis.from_url.assert_not_called()
+        with pytest.raises(ConnectionError):
+            repository.get_flight_events()
+        mock_redis.from_url.return_value.ping.side_effect = None
+        mock_redis.from_url.return_value.get.return_value = b'[]'
+        assert repository.get_flight_events() == []
+        assert mock_redis.from_url.call_args.kwargs['protocol'] == 3
+
+    def test_client_side_caching_is_requested(self, mock_redis):
+        repository = FlightsCacheRepository(repository_uri='redis://', cache_key='KEY', client_side_cache_size=16)
+        repository.get_snapshot_version()
+
+        assert mock_redis.from_url.call_args.kwargs['protocol'] == 3
+        assert mock_redis.from_url.call_args.kwargs['cache_config'].get_max_size() == 16
+
+    def test_falls_back_without_tracking_support(self, mock_redis):
+        tracking_connection, connection = MagicMock(), MagicMock()
+        tracking_connection.ping.side_effect = ResponseError('unknown command HELLO')
+        mock_redis.from_url.side_effect = [tracking_connection, connection]
+
+        repository = FlightsCacheRepository(repository_uri='redis://', cache_key='KEY', client_side_cache_size=16)
+
+        assert repository._connection is connection
+        assert repository._connection is connection
+        assert mock_redis.from_url.call_count == 2
+        assert mock_redis.from_url.call_args.kwargs == {}
+
+    def test_falls_back_when_client_side_caching_is_refused(self, mock_redis):
+        """redis-py refuses client-side caching for servers older than Redis 7.4 with a ConnectionError."""
+        tracking_connection, connection = MagicMock(), MagicMock()
+        tracking_connection.ping.side_effect = ConnectionError(
+            'To maximize compatibility with all Redis products, client-side caching is supported by Redis 7.4 or later'
+        )
+        mock_redis.from_url.side_effect = [tracking_connection, connection]
+
+        repository = FlightsCacheRepository(repository_uri='redis://', cache_key='KEY', client_side_cache_size=16)
+
+        assert repository._connection is connection
+        tracking_connection.close.assert_called_once()
+        connection.ping.assert_called_once()
+
+
+@patch('journeys.app.repositories.Redis')
+class TestJourneysCacheRepository:
+    """Test reading the journeys materialized by the cache refresher."""
+
+    def test_unavailable_redis_reports_journeys_not_materialized(self, mock_redis):
+        mock_redis.from_url.return_value.hget.side_effect = ConnectionError('MOCKED_REDIS_DOWN')
+        repository = JourneysCacheRepository(repository_uri='redis://', cache_key='KEY')
+
+        action = SearchJourneys(from_='BUE', to='MAD', date=datetime(2021, 12, 31).date())
+
+        assert repository.get_journeys(action) is None
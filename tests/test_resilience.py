@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from journeys.app.repositories import FlightsHTTPRepository
+from journeys.app.resilience import CircuitBreaker, HedgedCall
+from journeys.core.exceptions import FlightsProviderUnavailable
+
+PROVIDER_RESULT = {
+    'flight_number': 'IB1234',
+    'departure_city': 'BUE',
+    'arrival_city': 'MAD',
+    'departure_datetime': '2024-09-12T12:00:00Z',
+    'arrival_datetime': '2024-09-13T00:00:00Z',
+}
+
+
+def build_response(status_code: int, results: list[dict] | None = None) -> MagicMock:
+    response = MagicMock(status_code=status_code)
+    response.json.return_value = results or []
+    return response
+
+
+class TestCircuitBreaker:
+    """Test the circuit breaker states."""
+
+    def test_opens_after_consecutive_failures(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        circuit_breaker.record_failure()
+        assert circuit_breaker.allow()
+        circuit_breaker.record_failure()
+
+        assert circuit_breaker.state == CircuitBreaker.OPEN
+        assert not circuit_breaker.allow()
+
+    def test_success_resets_failures(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        circuit_breaker.record_failure()
+        circuit_breaker.record_success()
+        circuit_breaker.record_failure()
+
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_after_reset_timeout(self):
+        """Calls are allowed again once the reset timeout passed, and a single failure reopens it."""
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        circuit_breaker.record_failure()
+        circuit_breaker.record_failure()
+
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+        assert circuit_breaker.allow()
+        circuit_breaker.record_success()
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+class TestHedgedCall:
+    """Test hedging slow calls with a second concurrent one."""
+
+    def setup_method(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def teardown_method(self) -> None:
+        self.executor.shutdown(wait=False)
+
+    def test_fast_call_is_not_hedged(self):
+        hedged_call = HedgedCall(self.executor, hedge_after=1)
+
+        assert hedged_call(lambda: 'RESULT') == 'RESULT'
+        assert hedged_call.hedges_fired == 0
+
+    def test_slow_call_is_hedged_and_fastest_wins(self):
+        """The first call hangs, so the hedge fired after the threshold answers."""
+        release = Event()
+        calls = []
+
+        def call():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(timeout=5)
+                return 'SLOW'
+            return 'HEDGE'
+
+        hedged_call = HedgedCall(self.executor, hedge_after=0.01)
+
+        assert hedged_call(call) == 'HEDGE'
+        assert (hedged_call.hedges_fired, hedged_call.hedges_won) == (1, 1)
+        release.set()
+
+    def test_raises_when_every_call_fails(self):
+        def call():
+            raise FlightsProviderUnavailable('Provider answered 500.')
+
+        hedged_call = HedgedCall(self.executor, hedge_after=0.01)
+
+        with pytest.raises(FlightsProviderUnavailable):
+            hedged_call(call)
+
+
+@patch('journeys.app.repositories.requests.get')
+class TestFlightsHTTPRepository:
+    """Test timeouts, error handling and the circuit breaker fallback of the HTTP provider."""
+
+    def setup_method(self) -> None:
+        self.repository = FlightsHTTPRepository(
+            provider_base_url='https://provider',
+            endpoint='/flight-events',
+            connect_timeout=1,
+            read_timeout=2,
+            failure_threshold=2,
+            reset_timeout=60,
+        )
+
+    def test_requests_with_timeouts(self, mock_get):
+        mock_get.return_value = build_response(200, [PROVIDER_RESULT])
+
+        flight_events = self.repository.get_flight_events()
+
+        assert [flight_event.flight_number for flight_event in flight_events] == ['IB1234']
+        mock_get.assert_called_once_with(url='https://provider/flight-events', timeout=(1, 2))
+
+    def test_non_ok_response_raises_without_last_good(self, mock_get):
+        mock_get.return_value = build_response(500)
+
+        with pytest.raises(FlightsProviderUnavailable):
+            self.repository.get_flight_events()
+
+    def test_open_circuit_serves_last_good_without_calling_provider(self, mock_get):
+        mock_get.return_value = build_response(200, [PROVIDER_RESULT])
+        last_good = self.repository.get_flight_events()
+        mock_get.return_value = build_response(503)
+
+        assert self.repository.get_flight_events() == last_good
+        assert self.repository.get_flight_events() == last_good
+        assert self.repository.metrics()['circuit_breaker'] == CircuitBreaker.OPEN
+        calls = mock_get.call_count
+
+        assert self.repository.get_flight_events() == last_good
+        assert mock_get.call_count == calls
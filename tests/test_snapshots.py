@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from journeys.app.repositories import FlightsSnapshotFileRepository
+from journeys.app.snapshots import InvalidSnapshot, MappedFlightEvents, write_snapshot
+from journeys.core.indexes import FlightEventsIndex
+from journeys.core.models import FlightEvent
+
+FLIGHT_EVENTS = [
+    FlightEvent(
+        flight_number='IB1234',
+        from_='BUE',
+        to='MAD',
+        departure_time=datetime(2021, 12, 31, 23, 59),
+        arrival_time=datetime(2022, 1, 1, 12),
+    ),
+    FlightEvent(
+        flight_number='IB5678',
+        from_='MAD',
+        to='PAR',
+        departure_time=datetime(2022, 1, 1, 14, tzinfo=timezone.utc),
+        arrival_time=datetime(2022, 1, 1, 16, tzinfo=timezone(timedelta(hours=-3))),
+    ),
+]
+
+
+class TestSnapshots:
+    """Test the memory-mapped binary snapshot layout."""
+
+    def test_round_trip(self, tmp_path):
+        """Flight events read back from a snapshot file are equal to the written ones, timezones included."""
+        path = str(tmp_path / 'snapshot.bin')
+        write_snapshot(path, FLIGHT_EVENTS)
+
+        flight_events = MappedFlightEvents(path)
+
+        assert len(flight_events) == 2
+        assert list(flight_events) == FLIGHT_EVENTS
+        assert flight_events[-1] == FLIGHT_EVENTS[-1]
+        assert flight_events[0:1] == FLIGHT_EVENTS[0:1]
+
+    def test_invalid_file(self, tmp_path):
+        """A file that isn't a snapshot is rejected instead of being decoded as garbage."""
+        path = tmp_path / 'snapshot.bin'
+        path.write_bytes(b'NOT A SNAPSHOT')
+
+        with pytest.raises(InvalidSnapshot):
+            MappedFlightEvents(str(path))
+
+    def test_index_keeps_positions_instead_of_decoded_flight_events(self, tmp_path):
+        """Indexing a memory-mapped snapshot doesn't keep a decoded copy of it, flight events are decoded on access."""
+        path = str(tmp_path / 'snapshot.bin')
+        write_snapshot(path, FLIGHT_EVENTS)
+
+        index = FlightEventsIndex(MappedFlightEvents(path))
+
+        indexed = [value for departures in index._departures.values() for value in departures]
+        assert not any(isinstance(value, FlightEvent) for value in indexed)
+        assert list(index.departing_from('MAD')) == [FLIGHT_EVENTS[1]]
+        assert len(index.departing_from('BUE')) == 1
+        assert list(index.departing_from('PAR')) == []
+
+
+class TestFlightsSnapshotFileRepository:
+    """Test the repository reading the shared snapshot file."""
+
+    def test_missing_file_returns_no_flights(self, tmp_path):
+        repository = FlightsSnapshotFileRepository(snapshot_path=str(tmp_path / 'snapshot.bin'))
+
+        assert repository.get_flight_events() == []
+
+    def test_replaced_file_is_remapped(self, tmp_path):
+        """Once the refresher atomically replaces the file, the next call reads the new snapshot."""
+        path = str(tmp_path / 'snapshot.bin')
+        repository = FlightsSnapshotFileRepository(snapshot_path=path)
+        write_snapshot(path, FLIGHT_EVENTS[:1])
+        previous = repository.get_flight_events()
+
+        write_snapshot(path, FLIGHT_EVENTS)
+
+        assert list(repository.get_flight_events()) == FLIGHT_EVENTS
+        assert list(previous) == FLIGHT_EVENTS[:1]